@@ -1,14 +1,25 @@
-from fastapi import FastAPI, HTTPException, WebSocket, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, WebSocket, UploadFile, File, Depends, Query
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import logging
 from config import ALLOWED_ORIGINS
 from websocket_handler import handle_websocket_connection
-from document_service import process_document_upload
+from pdf_extraction import process_pool
+from ingestion_jobs import (
+    IngestionQueueFull,
+    get_job,
+    start_ingestion_workers,
+    stop_ingestion_workers,
+    submit_upload,
+)
+from session_summary_queue import start_session_summary_worker, stop_session_summary_worker
 from auth import get_current_user
 from typing import List, Optional
 from pydantic import BaseModel
 from custom_endpoints import router as persona_router
-from rag_service import get_user_knowledge_bases
+import kb_catalog
+from metrics import render_metrics
 from custom_supabase import (
     get_mcp_servers_for_user,
     create_mcp_server_for_user,
@@ -22,7 +33,17 @@ logging.basicConfig(
 logger = logging.getLogger("voicebot")
 
 # ---------------- INIT FastAPI ----------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_ingestion_workers()
+    start_session_summary_worker()
+    yield
+    await stop_ingestion_workers()
+    await stop_session_summary_worker()
+    process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(persona_router)
 
@@ -42,13 +63,43 @@ async def ws_pipeline(websocket: WebSocket):
     await handle_websocket_connection(websocket)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-style turn latency histograms and cache gauges"""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/upload_doc")
 async def upload_doc(
     kg_name: str, file: UploadFile = File(...), user=Depends(get_current_user)
 ):
-    return await process_document_upload(
-        file, userid=user["sub"], knowledge_base=kg_name
-    )
+    """Queue a PDF for background ingestion; poll /upload_doc/{job_id} for progress"""
+    if not file.filename.lower().endswith(".pdf"):
+        return {"error": "Only PDF files are supported"}
+    try:
+        job = await submit_upload(file, userid=user["sub"], knowledge_base=kg_name)
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=429, detail="Too many uploads in progress, try again shortly"
+        )
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "file": job.filename,
+        "knowledge_base": kg_name,
+        "message": "Upload received and queued for processing",
+    }
+
+
+@app.get("/upload_doc/{job_id}")
+async def upload_doc_status(job_id: str, user=Depends(get_current_user)):
+    """Per-stage progress of an ingestion job"""
+    job = get_job(job_id, userid=user["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
 
 
 @app.get("/mcps")
@@ -78,8 +129,7 @@ async def delete_mcp_server(server_id: str, user=Depends(get_current_user)):
 
 
 from map import MURF_VOICE_MAPPING
-from audio_services import murf_tts
-from io import BytesIO
+from audio_services import murf_tts_stream
 from fastapi.responses import StreamingResponse
 
 
@@ -87,11 +137,17 @@ from fastapi.responses import StreamingResponse
 async def test_voice(text: str, lang_code: str, user=Depends(get_current_user)):
     voice = MURF_VOICE_MAPPING[lang_code]
     print(voice)
-    audio_data = await murf_tts(text, voice)
-    audio_stream = BytesIO(audio_data)
+    chunks = murf_tts_stream(text, voice)
+    # Pull the first chunk before responding so Murf errors still surface as a 500
+    first_chunk = await anext(chunks, b"")
+
+    async def audio_stream():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
 
     return StreamingResponse(
-        audio_stream,
+        audio_stream(),
         media_type="audio/mpeg",
         headers={
             "Content-Disposition": "attachment; filename=voice_sample.mp3",
@@ -105,6 +161,8 @@ class KnowledgeBasesResponse(BaseModel):
     knowledge_bases: List[str]
     total_count: int
     user_id: str
+    offset: int = 0
+    limit: Optional[int] = None
 
 
 class DocumentResponse(BaseModel):
@@ -112,29 +170,42 @@ class DocumentResponse(BaseModel):
     filename: str
     knowledge_base: str
     upload_date: str
+    chunk_count: Optional[int] = None
+    total_chars: Optional[int] = None
+    page_count: Optional[int] = None
 
 
 class DocumentsResponse(BaseModel):
     documents: List[DocumentResponse]
     total_count: int
     knowledge_base: str
+    offset: int = 0
+    limit: Optional[int] = None
 
 
 @app.get("/knowledge_bases", response_model=KnowledgeBasesResponse)
-async def get_knowledge_bases(user=Depends(get_current_user)):
-    """Get all knowledge base names belonging to the authenticated user"""
+async def get_knowledge_bases(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    user=Depends(get_current_user),
+):
+    """Get a page of the knowledge base names belonging to the authenticated user"""
     try:
         user_id = user["sub"]
-        knowledge_bases = await get_user_knowledge_bases(user_id)
+        knowledge_bases, total_count = await kb_catalog.list_knowledge_bases(
+            user_id, offset=offset, limit=limit
+        )
 
         logger.info(
-            f"Retrieved {len(knowledge_bases)} knowledge bases for user {user_id}"
+            f"Retrieved {len(knowledge_bases)} of {total_count} knowledge bases for user {user_id}"
         )
 
         return KnowledgeBasesResponse(
             knowledge_bases=knowledge_bases,
-            total_count=len(knowledge_bases),
+            total_count=total_count,
             user_id=user_id,
+            offset=offset,
+            limit=limit,
         )
 
     except Exception as e:
@@ -145,20 +216,29 @@ async def get_knowledge_bases(user=Depends(get_current_user)):
 
 
 @app.get("/knowledge_bases/{kb_name}/documents", response_model=DocumentsResponse)
-async def get_kb_documents(kb_name: str, user=Depends(get_current_user)):
-    """Get all documents in a specific knowledge base"""
+async def get_kb_documents(
+    kb_name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    user=Depends(get_current_user),
+):
+    """Get a page of the documents in a specific knowledge base"""
     try:
-        from rag_service import get_kb_documents
-
         user_id = user["sub"]
-        documents = await get_kb_documents(user_id, kb_name)
+        documents, total_count = await kb_catalog.list_documents(
+            user_id, kb_name, offset=offset, limit=limit
+        )
 
         logger.info(
-            f"Retrieved {len(documents)} documents for knowledge base '{kb_name}' for user {user_id}"
+            f"Retrieved {len(documents)} of {total_count} documents for knowledge base '{kb_name}' for user {user_id}"
         )
 
         return DocumentsResponse(
-            documents=documents, total_count=len(documents), knowledge_base=kb_name
+            documents=documents,
+            total_count=total_count,
+            knowledge_base=kb_name,
+            offset=offset,
+            limit=limit,
         )
 
     except Exception as e:
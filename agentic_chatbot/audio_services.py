@@ -1,10 +1,30 @@
 from groq import AsyncGroq
-from config import GROQ_API_KEY, ASR_MODEL, MURF_API_KEY
+from config import (
+    GROQ_API_KEY,
+    ASR_MODEL,
+    MURF_API_KEY,
+    TTS_CACHE_MAX_BYTES,
+    TTS_CACHE_DIR,
+    TTS_CACHE_DISK_MAX_BYTES,
+    TTS_CACHE_MAX_TEXT_CHARS,
+    TTS_CACHE_CHUNK_SIZE,
+)
 import soundfile as sf
 import numpy as np
 from huggingface_hub import hf_hub_download
 from concurrent.futures import ThreadPoolExecutor
 from murf import AsyncMurf
+from metrics import register_gauges
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import threading
+
+logger = logging.getLogger("voicebot")
 
 
 groq = AsyncGroq(api_key=GROQ_API_KEY)
@@ -31,14 +51,179 @@ async def groq_asr_bytes(audio_bytes: bytes, model: str = ASR_MODEL, language: s
 
 murf_client = AsyncMurf(api_key=MURF_API_KEY)
 
-async def murf_tts(text: str, voice_id: str = "en-IN-isha", format: str = "MP3") -> bytes:
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio.
+
+    Memory tier: LRU bounded by total bytes. Disk tier (optional): one file
+    per key under disk_dir, read back through mmap, so it survives restarts;
+    the oldest files are evicted once disk_max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Computed lazily on the first disk write
+        self._disk_lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice_id: str, format: str, sample_rate: float) -> str:
+        normalized = " ".join(text.split())
+        raw = f"{normalized}\x1f{voice_id}\x1f{format.upper()}\x1f{sample_rate}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return audio
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            audio = await loop.run_in_executor(executor, self._read_disk, key)
+            if audio is not None:
+                self.disk_hits += 1
+                self._put_memory(key, audio)
+                return audio
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, audio: bytes):
+        self._put_memory(key, audio)
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(executor, self._write_disk, key, audio)
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    audio = mapped[:]
+            os.utime(path)  # Keeps eviction roughly least-recently-used
+            return audio
+        except (FileNotFoundError, ValueError):
+            # ValueError: empty file left by an interrupted write
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(audio)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict_disk(self):
+        # Drop the least recently used files down to 90% of the budget
+        target = int(self.disk_max_bytes * 0.9)
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+tts_cache = TTSCache(TTS_CACHE_MAX_BYTES, TTS_CACHE_DIR, TTS_CACHE_DISK_MAX_BYTES)
+register_gauges("tts_cache", tts_cache.stats)
+
+
+async def murf_tts_stream(text: str, voice_id: str = "en-IN-isha", format: str = "MP3", sample_rate: float = 44100.0) -> AsyncIterator[bytes]:
+    """Yields Murf audio chunks as they arrive instead of buffering the whole clip.
+
+    Short phrases go through the TTS cache; cached audio is replayed in
+    TTS_CACHE_CHUNK_SIZE chunks so streaming callers see the same shape.
+    """
+    cacheable = len(text) <= TTS_CACHE_MAX_TEXT_CHARS
+    if cacheable:
+        key = TTSCache.key(text, voice_id, format, sample_rate)
+        audio = await tts_cache.get(key)
+        if audio is not None:
+            for start in range(0, len(audio), TTS_CACHE_CHUNK_SIZE):
+                yield audio[start:start + TTS_CACHE_CHUNK_SIZE]
+            return
+
     resp = murf_client.text_to_speech.stream(
         text=text,
         voice_id=voice_id,
         format=format,
-        sample_rate=44100.0
+        sample_rate=sample_rate
     )
-    chunks = [chunk async for chunk in resp]
+    chunks = []
+    async for chunk in resp:
+        if cacheable:
+            chunks.append(chunk)
+        yield chunk
+
+    # Only complete syntheses are cached
+    if cacheable and chunks:
+        try:
+            await tts_cache.put(key, b"".join(chunks))
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write TTS cache entry: {e}")
+
+async def murf_tts(text: str, voice_id: str = "en-IN-isha", format: str = "MP3") -> bytes:
+    chunks = [chunk async for chunk in murf_tts_stream(text, voice_id=voice_id, format=format)]
     full_audio = b''.join(chunks)
     return full_audio
 
@@ -0,0 +1,83 @@
+"""
+Concurrency benchmark for the anonymous (basic) graph.
+
+Runs N simultaneous sessions against a fake chat model with a fixed latency,
+once through a node that calls the synchronous llm.invoke (the old
+behaviour) and once through the shared async graph. With a blocking node the
+sessions run one after another (wall time ~ N x latency); with the async node
+they overlap (wall time ~ latency).
+
+Run: python bench_anonymous_concurrency.py --sessions 8 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph import StateGraph, END
+
+from llm_service import State, build_basic_graph
+
+
+class SlowChatModel(BaseChatModel):
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("Hello there."))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def build_blocking_graph(llm):
+    # The old llm_basic_node: declared async but calls the sync client
+    async def llm_basic_node(state: State):
+        return {"messages": [llm.invoke(state["messages"])]}
+
+    builder = StateGraph(State)
+    builder.add_node("llm_basic", llm_basic_node)
+    builder.set_entry_point("llm_basic")
+    builder.add_edge("llm_basic", END)
+    return builder.compile()
+
+
+async def run_sessions(graph, sessions):
+    async def session(i):
+        await graph.ainvoke({"messages": [HumanMessage(f"Hi, I am caller {i}")]})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    llm = SlowChatModel(latency=args.latency)
+    for name, graph in (
+        ("blocking", build_blocking_graph(llm)),
+        ("async", build_basic_graph(llm)),
+    ):
+        elapsed = await run_sessions(graph, args.sessions)
+        print(
+            f"{name:<9} {args.sessions} sessions in {elapsed:6.2f} s   "
+            f"overlap factor {args.sessions * args.latency / elapsed:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Bulk insert benchmark for document_vectors.
+
+Inserts synthetic embedded chunks through bulk_insert against a fake
+PostgREST client that charges a fixed round trip per request plus the time
+to upload its JSON body over a shared link, and rejects bodies over a size limit like a real
+gateway. Reports throughput for several batch sizes and the payload saved by
+the compact vector encoding. --fail-rate makes some requests fail after
+committing, to check that retries don't duplicate rows.
+
+Run: python bench_bulk_insert.py --rows 2000 --rtt 0.05 --mbps 20
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import numpy as np
+
+import bulk_insert
+from bulk_insert import bulk_insert_rows, encode_vector, make_chunk_id
+from config import EMBEDDING_SIZE
+
+
+class FakeQuery:
+    def __init__(self, client, table, op, payload=None):
+        self.client, self.table, self.op, self.payload = client, table, op, payload
+        self.ids = None
+
+    def in_(self, column, values):
+        self.ids = set(values)
+        return self
+
+    async def execute(self):
+        client = self.client
+        if self.op == "delete":
+            await asyncio.sleep(client.rtt)
+            client.rows = {k: v for k, v in client.rows.items() if k not in self.ids}
+            return
+        body = json.dumps(self.payload)
+        if len(body) > client.max_body:
+            raise RuntimeError(f"413 payload too large ({len(body)} bytes)")
+        client.requests += 1
+        client.bytes += len(body)
+        async with client.link:  # Requests share the uplink
+            await asyncio.sleep(len(body) / client.bytes_per_second)
+        await asyncio.sleep(client.rtt)
+        for row in self.payload:
+            client.rows[row["metadata"]["chunk_id"]] = client.rows.get(row["metadata"]["chunk_id"], 0) + 1
+        if random.random() < client.fail_rate:
+            raise RuntimeError("connection reset after commit")
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def insert(self, rows, **kwargs):
+        return FakeQuery(self.client, self.name, "insert", rows)
+
+    def delete(self):
+        return FakeQuery(self.client, self.name, "delete")
+
+
+class FakePostgREST:
+    def __init__(self, rtt, mbps, max_body, fail_rate=0.0):
+        self.rtt = rtt
+        self.bytes_per_second = mbps * 1024 * 1024 / 8
+        self.max_body = max_body
+        self.fail_rate = fail_rate
+        self.link = asyncio.Lock()
+        self.rows = {}
+        self.requests = 0
+        self.bytes = 0
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def synthetic_rows(count, encode):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(count):
+        vector = rng.standard_normal(EMBEDDING_SIZE).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        rows.append({
+            "content": "Hold the power button for five seconds until the light turns blue. " * 14,
+            "metadata": {"source": "manual.pdf", "kb_identifier": "bench_kb",
+                         "chunk_id": make_chunk_id("bench_kb", "manual.pdf", str(i))},
+            "embedding": encode_vector(vector) if encode else vector.tolist(),
+        })
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--rtt", type=float, default=0.05)
+    parser.add_argument("--mbps", type=float, default=20.0)
+    parser.add_argument("--max-body-mb", type=float, default=4.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    max_body = int(args.max_body_mb * 1024 * 1024)
+    bulk_insert._insert_slots = asyncio.Semaphore(bulk_insert.INSERT_MAX_IN_FLIGHT)
+
+    for encode in (False, True):
+        rows = synthetic_rows(args.rows, encode)
+        label = "compact" if encode else "json floats"
+        print(f"-- {label}: {len(json.dumps(rows)) / len(rows) / 1024:.1f} KiB per row")
+        for batch_rows in (25, 100, 200, 500, args.rows):
+            client = FakePostgREST(args.rtt, args.mbps, max_body, args.fail_rate)
+            try:
+                stats = await bulk_insert_rows(client, rows, max_rows=batch_rows, max_bytes=max_body)
+            except RuntimeError as e:
+                print(f"batch {batch_rows:>5}   failed: {e}")
+                continue
+            duplicates = sum(1 for n in client.rows.values() if n > 1)
+            print(
+                f"batch {batch_rows:>5}   {stats['batches']:>4} requests   "
+                f"{stats['rows_per_second']:8.0f} rows/s   "
+                f"{client.bytes / 1024 / 1024:6.1f} MiB sent   "
+                f"{len(client.rows)} rows stored, {duplicates} duplicated"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
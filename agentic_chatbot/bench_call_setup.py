@@ -0,0 +1,123 @@
+"""
+Call-setup latency benchmark for get_user_runtime_variables.
+
+Runs against a local fake PostgREST client that answers every request after a
+fixed round-trip delay, so no Supabase project is needed. The "sequential"
+row serializes requests, which is what the old one-query-after-another loader
+paid; "concurrent" is the new two-wave loader; "cached" is a repeat call
+served from the per-user TTL cache.
+
+Run: python bench_call_setup.py --rtt-ms 40 --calls 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+import custom_supabase
+
+USER_ID = "bench-user"
+PERSONA_ID = "bench-persona"
+SERVER_ID = "bench-server"
+
+TABLES = {
+    "user_active_persona": [
+        {"user_id": USER_ID, "active_persona_id": PERSONA_ID, "persona_source": "user"}
+    ],
+    "personas": [
+        {
+            "id": PERSONA_ID,
+            "user_id": USER_ID,
+            "custom_prompt": "You are a helpful support agent.",
+            "knowledge_base": "manuals",
+            "language": "en",
+            "accent": "en-IN",
+            "mcp_server_id": SERVER_ID,
+        }
+    ],
+    "user_persona_session_summary": [
+        {"user_id": USER_ID, "persona_id": PERSONA_ID, "session_summary": "{}"}
+    ],
+    "mcp_servers": [
+        {
+            "server_id": SERVER_ID,
+            "user_id": USER_ID,
+            "name": "bench",
+            "url": "http://localhost:9/mcp",
+            "bearer_token": None,
+            "created_at": "2025-01-01T00:00:00",
+        }
+    ],
+}
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+
+    def select(self, *_):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    async def execute(self):
+        self.client.requests += 1
+        if self.client.lock:
+            async with self.client.lock:
+                await asyncio.sleep(self.client.rtt)
+        else:
+            await asyncio.sleep(self.client.rtt)
+        rows = [
+            row
+            for row in TABLES[self.table]
+            if all(row.get(column) == value for column, value in self.filters)
+        ]
+        return SimpleNamespace(data=rows)
+
+
+class FakePostgREST:
+    def __init__(self, rtt: float, serialize: bool):
+        self.rtt = rtt
+        self.lock = asyncio.Lock() if serialize else None
+        self.requests = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+async def measure(name, client, calls, cached):
+    custom_supabase.supabase_client = client
+    custom_supabase._initialized = True
+    custom_supabase.invalidate_runtime_variables(USER_ID)
+    timings = []
+    for _ in range(calls):
+        if not cached:
+            custom_supabase.invalidate_runtime_variables(USER_ID)
+        started = time.perf_counter()
+        await custom_supabase.get_user_runtime_variables(USER_ID)
+        timings.append(time.perf_counter() - started)
+    print(
+        f"{name:<11} p50 {statistics.median(timings) * 1000:7.1f} ms   "
+        f"max {max(timings) * 1000:7.1f} ms   requests/call {client.requests / calls:4.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt-ms", type=float, default=40)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    await measure("sequential", FakePostgREST(rtt, serialize=True), args.calls, False)
+    await measure("concurrent", FakePostgREST(rtt, serialize=False), args.calls, False)
+    await measure("cached", FakePostgREST(rtt, serialize=False), args.calls, True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Ingestion embedding benchmark.
+
+Compares the old ingestion path (one embed_query per chunk, run inline in the
+async function) with batched embed_documents on the embedding executor.
+Reports chunks/sec and how late a 10 ms event-loop ticker wakes up while
+ingestion is running, i.e. the lag a live voice call on the same worker sees.
+
+Run: python bench_embedding.py --chunks 256 --batch-size 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from embedding_service import embedding_model, embed_documents
+
+TICK = 0.01
+
+
+def make_chunks(n: int):
+    sentence = (
+        "The onboarding manual explains how to configure the device, pair it "
+        "with the mobile application and reset it to factory settings. "
+    )
+    return [f"Section {i}. " + sentence * 7 for i in range(n)]
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def old_ingest(chunks):
+    # Baseline: what SupabaseVectorStore.add_documents used to do
+    return [embedding_model.embed_query(chunk) for chunk in chunks]
+
+
+async def new_ingest(chunks, batch_size):
+    return await embed_documents(chunks, batch_size=batch_size)
+
+
+async def measure(name, ingest, chunks):
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(probe_loop_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await ingest(chunks)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags = lags or [0.0]
+    print(
+        f"{name:<10} {len(chunks) / elapsed:8.1f} chunks/s   "
+        f"loop lag p50 {statistics.median(lags) * 1000:8.1f} ms   "
+        f"max {max(lags) * 1000:8.1f} ms   ticks {len(lags)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    # Warm up the model so the first measurement does not pay for loading
+    embedding_model.embed_documents(chunks[:2])
+
+    await measure("before", old_ingest, chunks)
+    await measure("after", lambda c: new_ingest(c, args.batch_size), chunks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Embedding backend parity and speed check.
+
+Embeds the same documents and queries with the PyTorch backend and the ONNX
+backend, checks that each pair of vectors agrees (cosine similarity) and that
+both backends retrieve the same top document per query, then times single
+query latency (batch 1) and ingestion throughput (batch 64).
+
+Run: python bench_embedding_backends.py
+Offline: EMBEDDING_MODEL_PATH=/models/nomic-embed-text-v1.5 python bench_embedding_backends.py
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from config import EMBEDDING_DOCUMENT_PREFIX, EMBEDDING_QUERY_PREFIX
+from embedding_service import create_embedding_model
+
+DOCUMENTS = [
+    "To reset the router, hold the power button for ten seconds until the light blinks amber.",
+    "Refunds are issued to the original payment method within five to seven business days.",
+    "The warranty covers manufacturing defects for two years from the date of purchase.",
+    "Our support line is open Monday to Friday from nine in the morning to six in the evening.",
+    "Firmware updates are installed automatically overnight when the device is idle.",
+    "You can change the delivery address from the orders page until the parcel has shipped.",
+    "The battery lasts about twelve hours of continuous playback at medium volume.",
+    "Premium members get free shipping and early access to seasonal sales.",
+]
+QUERIES = [
+    "how do I factory reset my router",
+    "when will I get my money back",
+    "what does the guarantee include",
+    "what time can I call customer service",
+    "does the device update itself",
+    "can I ship my order somewhere else",
+    "how long does the battery last",
+    "benefits of the premium plan",
+]
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = [EMBEDDING_DOCUMENT_PREFIX + d for d in DOCUMENTS]
+    queries = [EMBEDDING_QUERY_PREFIX + q for q in QUERIES]
+    batch = (docs * 8)[:64]
+
+    vectors = {}
+    for backend in ("torch", "onnx"):
+        model = create_embedding_model(backend)
+        model.embed_documents(docs[:2])  # Warm up
+        doc_vectors = np.array(model.embed_documents(docs))
+        query_vectors = np.array([model.embed_query(q) for q in queries])
+        vectors[backend] = (doc_vectors, query_vectors)
+
+        single = timed(lambda: model.embed_query(queries[0]), args.repeats)
+        bulk = timed(lambda: model.embed_documents(batch), max(2, args.repeats // 5))
+        print(
+            f"{backend:<6} batch 1: p50 {statistics.median(single) * 1000:7.1f} ms   "
+            f"batch 64: {len(batch) / statistics.median(bulk):7.1f} texts/s"
+        )
+
+    cosines = np.concatenate([
+        np.sum(vectors["torch"][i] * vectors["onnx"][i], axis=1) for i in range(2)
+    ])
+    print(f"parity  cosine min {cosines.min():.4f}   mean {cosines.mean():.4f}")
+    top = {b: np.argmax(q @ d.T, axis=1) for b, (d, q) in vectors.items()}
+    agreement = float(np.mean(top["torch"] == top["onnx"]))
+    print(f"top-1 agreement {agreement:.0%}")
+    assert cosines.min() >= args.min_cosine, "ONNX embeddings drifted from the PyTorch ones"
+    assert agreement == 1.0, "ONNX backend ranks documents differently"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Hybrid retrieval benchmark.
+
+Indexes a fixture catalogue (near-identical passages that differ mostly in
+model numbers and product names, as real manuals do) into a temporary
+LocalVectorStore and LexicalIndex, then runs spoken-style questions through
+vector-only, BM25-only and fused retrieval. Reports hit@1, recall@k, MRR and
+per-query latency for each.
+
+Run: python bench_hybrid_retrieval.py --k 4
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from config import EMBEDDING_DIM, RRF_K, SEARCH_CANDIDATES
+from embedding_service import embed_documents, embed_query
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from local_vector_store import LocalVectorStore
+
+KB = "bench-user_catalogue"
+
+PRODUCTS = [
+    ("XR-200", "Nimbus", "router", "hold the reset button for ten seconds"),
+    ("XR-300", "Nimbus Pro", "router", "hold the reset button for fifteen seconds"),
+    ("AX-55", "Breeze", "air purifier", "replace the HEPA filter every six months"),
+    ("AX-75", "Breeze Max", "air purifier", "replace the HEPA filter every nine months"),
+    ("KT-9", "Brewmate", "kettle", "descale with citric acid every month"),
+    ("KT-12", "Brewmate Duo", "kettle", "descale with citric acid every two months"),
+    ("SL-4", "Vaultline", "smart lock", "change the AA batteries once a year"),
+    ("SL-8", "Vaultline Edge", "smart lock", "recharge the battery pack every three months"),
+    ("HV-1", "Torrent", "vacuum", "empty the dust bin after every use"),
+    ("HV-3", "Torrent Cordless", "vacuum", "wash the foam filter every two weeks"),
+]
+FACTS = [
+    ("warranty", "is covered by a {years} year warranty against manufacturing defects"),
+    ("maintenance", "maintenance: {care}"),
+    ("support", "support for the {name} is available on the {code} hotline extension {ext}"),
+]
+QUESTIONS = [
+    ("whats the warranty on the {code_spoken}", "warranty"),
+    ("how do I look after my {name}", "maintenance"),
+    ("who do I call about the {code_spoken} {kind}", "support"),
+]
+
+
+def build_corpus():
+    docs, questions = [], []
+    for i, (code, name, kind, care) in enumerate(PRODUCTS):
+        for topic, template in FACTS:
+            text = f"The {name} {kind} (model {code}) " + template.format(
+                years=1 + i % 3, care=care, name=name, code=code, ext=100 + i
+            ) + "."
+            docs.append(Document(
+                page_content=text,
+                metadata={"kb_identifier": KB, "source": "catalogue.pdf", "key": f"{code}:{topic}"},
+            ))
+        for template, topic in QUESTIONS:
+            spoken = code.replace("-", " ")
+            questions.append((template.format(code_spoken=spoken, name=name, kind=kind), f"{code}:{topic}"))
+    return docs, questions
+
+
+def score(rankings, questions, k):
+    hits, recalls, rr = [], [], []
+    for docs, (_, expected) in zip(rankings, questions):
+        keys = [doc.metadata["key"] for doc in docs[:k]]
+        hits.append(bool(keys) and keys[0] == expected)
+        recalls.append(expected in keys)
+        rr.append(1.0 / (keys.index(expected) + 1) if expected in keys else 0.0)
+    return statistics.mean(hits), statistics.mean(recalls), statistics.mean(rr)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    docs, questions = build_corpus()
+    with tempfile.TemporaryDirectory() as vector_dir, tempfile.TemporaryDirectory() as lexical_dir:
+        store = LocalVectorStore(vector_dir, embed_documents, embed_query, default_dim=EMBEDDING_DIM)
+        lexical = LexicalIndex(lexical_dir)
+        await store.add_documents(docs)
+        await lexical.add(docs)
+        filter_conditions = {"kb_identifier": KB}
+
+        async def vector(query):
+            return await store.similarity_search(query, k=SEARCH_CANDIDATES, filter_conditions=filter_conditions)
+
+        async def bm25(query):
+            return await lexical.search(KB, query, SEARCH_CANDIDATES)
+
+        async def hybrid(query):
+            rankings = await asyncio.gather(vector(query), bm25(query))
+            return reciprocal_rank_fusion(rankings, limit=SEARCH_CANDIDATES, rrf_k=RRF_K)
+
+        for query, _ in questions:  # Warm the query embedding cache so latency compares search only
+            await embed_query(query)
+
+        print(f"{'method':<8} {'hit@1':>6} {f'recall@{args.k}':>9} {'MRR':>6} {'p50 ms':>7}")
+        for name, search in (("vector", vector), ("bm25", bm25), ("hybrid", hybrid)):
+            rankings, times = [], []
+            for query, _ in questions:
+                started = time.perf_counter()
+                rankings.append(await search(query))
+                times.append(time.perf_counter() - started)
+            hit1, recall, mrr = score(rankings, questions, args.k)
+            print(f"{name:<8} {hit1:6.2f} {recall:9.2f} {mrr:6.2f} {statistics.median(times) * 1000:7.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
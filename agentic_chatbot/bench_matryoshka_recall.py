@@ -0,0 +1,100 @@
+"""
+Matryoshka dimension benchmark.
+
+Embeds a small fixture corpus of support-style passages once at full size,
+then for each output dimension reports:
+- recall@1 and recall@3 of the passage each query was written for
+- overlap with the full-size top 10 neighbours
+- bytes per vector on the wire
+- brute-force search time over the corpus padded to --corpus-size with
+  perturbed copies
+
+Run: python bench_matryoshka_recall.py --dims 768 512 256 128 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bulk_insert import encode_vector
+from embedding_service import embed_documents_sync, embed_query_sync, truncate_embeddings
+
+# (passage, query written for it)
+FIXTURE = [
+    ("To reset the router, hold the power button for ten seconds until the light blinks amber.", "how do I factory reset my router"),
+    ("Refunds are issued to the original payment method within five to seven business days.", "when will I get my money back"),
+    ("The warranty covers manufacturing defects for two years from the date of purchase.", "what does the guarantee include"),
+    ("Our support line is open Monday to Friday from nine in the morning to six in the evening.", "what time can I call customer service"),
+    ("Firmware updates are installed automatically overnight when the device is idle.", "does the device update itself"),
+    ("You can change the delivery address from the orders page until the parcel has shipped.", "can I ship my order somewhere else"),
+    ("The battery lasts about twelve hours of continuous playback at medium volume.", "how long does the battery last"),
+    ("Premium members get free shipping and early access to seasonal sales.", "benefits of the premium plan"),
+    ("Passwords must be at least twelve characters and include a number and a symbol.", "password requirements"),
+    ("Two-factor authentication can be enabled under Settings, Security, Sign-in methods.", "turn on 2FA"),
+    ("Invoices for business accounts are emailed on the first working day of each month.", "when do I receive my invoice"),
+    ("The thermostat learns your schedule within a week and adjusts heating automatically.", "does the thermostat program itself"),
+    ("Clean the coffee machine with descaling solution every three months to prevent buildup.", "how often should I descale"),
+    ("Items bought on clearance cannot be returned unless they arrive damaged.", "can I return a sale item"),
+    ("The mobile app supports offline mode; changes sync once you reconnect.", "use the app without internet"),
+    ("Student discounts require verification with a valid university email address.", "how to get the student discount"),
+    ("The camera records in 4K at thirty frames per second and 1080p at sixty.", "video resolution and frame rate"),
+    ("Gift cards never expire and can be combined with other promotions.", "do gift cards expire"),
+    ("Our headquarters are located in Bengaluru, with regional offices in Pune and Delhi.", "where is the company based"),
+    ("To cancel a subscription, open Billing and choose End plan; access continues until the period ends.", "how do I cancel my subscription"),
+    ("The vacuum's filter is washable and should be replaced once a year.", "vacuum filter maintenance"),
+    ("Orders above five hundred rupees qualify for free standard delivery.", "minimum order for free delivery"),
+    ("The smart lock can be opened with a PIN, a fingerprint, or the companion app.", "ways to unlock the door lock"),
+    ("Data exports are generated as CSV files and kept available for seven days.", "download my data"),
+]
+
+
+def truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+    return np.vstack([
+        np.array(truncate_embeddings(vectors[start:start + 2000].tolist(), dim), dtype=np.float32)
+        for start in range(0, len(vectors), 2000)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 512, 256, 128, 64])
+    parser.add_argument("--corpus-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    passages = [p for p, _ in FIXTURE]
+    full_docs = np.array(embed_documents_sync(passages), dtype=np.float32)
+    full_queries = np.array([embed_query_sync(q) for _, q in FIXTURE], dtype=np.float32)
+    truth = np.arange(len(FIXTURE))
+
+    rng = np.random.default_rng(0)
+    noise = rng.standard_normal((args.corpus_size - len(passages), full_docs.shape[1])).astype(np.float32)
+    padding = full_docs[rng.integers(0, len(passages), len(noise))] + 0.15 * noise
+    padding /= np.linalg.norm(padding, axis=1, keepdims=True)
+    reference = None
+
+    print(f"{'dim':>4}  {'R@1':>5}  {'R@3':>5}  {'top10 overlap':>13}  {'bytes/vec':>9}  {'search ms':>9}")
+    for dim in args.dims:
+        docs = truncate(full_docs, dim)
+        queries = truncate(full_queries, dim)
+        corpus = np.vstack([docs, truncate(padding, dim)])
+
+        ranked = np.argsort(-(queries @ docs.T), axis=1)
+        recall1 = np.mean(ranked[:, 0] == truth)
+        recall3 = np.mean([t in row[:3] for t, row in zip(truth, ranked)])
+
+        started = time.perf_counter()
+        scores = queries @ corpus.T
+        top10 = np.argpartition(-scores, 10, axis=1)[:, :10]
+        search_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        if reference is None:
+            reference = top10
+        overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top10, reference)])
+
+        print(
+            f"{dim:>4}  {recall1:5.2f}  {recall3:5.2f}  {overlap:13.2f}  "
+            f"{len(encode_vector(docs[0])):>9}  {search_ms:9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
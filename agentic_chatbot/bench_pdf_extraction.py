@@ -0,0 +1,104 @@
+"""
+PDF extraction benchmark.
+
+Writes a synthetic multi-hundred-page PDF and compares serial pdfplumber
+extraction (what the upload path used to do in the request thread) with the
+page-range parallel engine in pdf_extraction.
+
+Run: python bench_pdf_extraction.py --pages 300
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from pdf_extraction import extract_pdf_pages, iter_pdf_pages, process_pool
+
+LINE = "Step {n}: hold the power button for five seconds until the light turns blue."
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a plain text PDF (Helvetica, one content stream per page) without extra dependencies."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1
+    objects.append(None)  # Placeholder for the page tree
+    kids = []
+    for page in range(pages):
+        lines = [
+            f"({LINE.format(n=page * lines_per_page + i)}) Tj T*"
+            for i in range(lines_per_page)
+        ]
+        stream = ("BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                % (pages_id, font, content)
+            )
+        )
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog, xref)
+        )
+
+
+async def parallel_extract(path: str, pages_per_task: int):
+    return [page async for page in iter_pdf_pages(path, pages_per_task=pages_per_task)]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pages-per-task", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        write_synthetic_pdf(path, args.pages)
+        print(f"Synthetic PDF: {args.pages} pages, {os.path.getsize(path) / 1024:.0f} KiB")
+
+        # Start the worker processes before timing
+        await asyncio.get_running_loop().run_in_executor(process_pool, len, [])
+
+        started = time.perf_counter()
+        serial = extract_pdf_pages(path)
+        serial_time = time.perf_counter() - started
+        print(f"serial     {serial_time:6.2f} s   {len(serial) / serial_time:7.1f} pages/s")
+
+        started = time.perf_counter()
+        parallel = await parallel_extract(path, args.pages_per_task)
+        parallel_time = time.perf_counter() - started
+        print(f"parallel   {parallel_time:6.2f} s   {len(parallel) / parallel_time:7.1f} pages/s")
+
+        assert parallel == serial, "parallel extraction must return the same pages in order"
+        print(f"speedup    {serial_time / parallel_time:6.2f}x")
+
+    process_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
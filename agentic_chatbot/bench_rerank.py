@@ -0,0 +1,73 @@
+"""
+Rerank benchmark.
+
+Uses the fixture catalogue from bench_hybrid_retrieval: for every question it
+fetches RERANK_CANDIDATES fused candidates, then compares handing the top k
+straight to the LLM with reranking them. Reports hit@1, the characters (and
+rough tokens) search_docs would add to the prompt, rerank latency and how
+often the time budget forced a fallback.
+
+In production the same numbers are on /metrics: voicebot_search_result_chars
+(retrieved vs returned), voicebot_retrieval_stage_seconds{stage="rerank"}
+and the llm/total stages of voicebot_turn_stage_seconds.
+
+Run: RERANK_ENABLED=true python bench_rerank.py --budget-ms 150
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from config import EMBEDDING_DIM, RERANK_CANDIDATES, RRF_K, SEARCH_TOP_K
+from embedding_service import embed_documents, embed_query
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from local_vector_store import LocalVectorStore
+from reranker import rerank, _stats
+from bench_hybrid_retrieval import KB, build_corpus
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=SEARCH_TOP_K)
+    parser.add_argument("--budget-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    docs, questions = build_corpus()
+    with tempfile.TemporaryDirectory() as vector_dir, tempfile.TemporaryDirectory() as lexical_dir:
+        store = LocalVectorStore(vector_dir, embed_documents, embed_query, default_dim=EMBEDDING_DIM)
+        lexical = LexicalIndex(lexical_dir)
+        await store.add_documents(docs)
+        await lexical.add(docs)
+
+        await rerank(questions[0][0], docs[:2], 1, budget_ms=10_000)  # Warm up the model
+        rows = {"top-k": [], "rerank": []}
+        latencies = []
+        for query, expected in questions:
+            rankings = await asyncio.gather(
+                store.similarity_search(query, k=RERANK_CANDIDATES, filter_conditions={"kb_identifier": KB}),
+                lexical.search(KB, query, RERANK_CANDIDATES),
+            )
+            candidates = reciprocal_rank_fusion(rankings, limit=RERANK_CANDIDATES, rrf_k=RRF_K)
+            started = time.perf_counter()
+            reranked = await rerank(query, candidates, args.k, budget_ms=args.budget_ms)
+            latencies.append(time.perf_counter() - started)
+            for name, result in (("top-k", candidates[:args.k]), ("rerank", reranked)):
+                rows[name].append((
+                    bool(result) and result[0].metadata["key"] == expected,
+                    sum(len(doc.page_content) for doc in result),
+                ))
+        store.close()
+
+    print(f"{'':<7} {'hit@1':>6} {'prompt chars':>13} {'~tokens':>8}")
+    for name, results in rows.items():
+        chars = statistics.mean(c for _, c in results)
+        print(f"{name:<7} {statistics.mean(h for h, _ in results):6.2f} {chars:13.0f} {chars / 4:8.0f}")
+    print(
+        f"rerank latency p50 {statistics.median(latencies) * 1000:.1f} ms   "
+        f"max {max(latencies) * 1000:.1f} ms   fallbacks {_stats['fallbacks']}/{_stats['calls'] - 1}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Local vector store benchmark.
+
+Fills a LocalVectorStore with synthetic clustered unit vectors (no model, no
+network: embeddings are injected), then compares exact search with the IVF
+index on latency and recall@k against the exact result, and reopens the
+store from disk to check that the memory-mapped data survives a restart,
+including after a delete has freed the slots at the end of the files.
+
+Run: python bench_vector_store.py --rows 50000 --dim 256
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from local_vector_store import LocalVectorStore, store_executor
+
+KB = "bench-user_manuals"
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_store(directory, dim, queries, ivf_min_rows, nprobe, **kwargs):
+    async def embed_documents(texts, dim=None):
+        raise NotImplementedError
+
+    async def embed_query(text, dim=None):
+        return queries[int(text)]
+
+    return LocalVectorStore(
+        directory, embed_documents, embed_query, default_dim=dim, ivf_min_rows=ivf_min_rows, nprobe=nprobe, **kwargs
+    )
+
+
+async def run_queries(store, count, k):
+    results, times = [], []
+    for i in range(count):
+        started = time.perf_counter()
+        docs = await store.similarity_search(str(i), k=k, filter_conditions={"kb_identifier": KB})
+        times.append(time.perf_counter() - started)
+        results.append({doc.metadata["n"] for doc in docs})
+    return results, times
+
+
+async def check_reopen_after_delete(dim: int, rng):
+    """Deleting the last document shrinks the live slots below the file size; reopening must keep the data."""
+    vectors = clustered_vectors(6, dim, 2, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        store = make_store(directory, dim, vectors, 1000, 1, initial_capacity=4)
+        for source, rows in (("a.pdf", range(0, 2)), ("b.pdf", range(2, 6))):
+            docs = [Document(page_content=f"chunk {n}", metadata={"kb_identifier": KB, "source": source, "n": n}) for n in rows]
+            await store.add_embedded_documents(docs, vectors[rows.start:rows.stop].tolist())
+        await store.delete_document(KB, "b.pdf")
+        store.close()
+
+        reopened = make_store(directory, dim, vectors, 1000, 1, initial_capacity=4)
+        for n in range(2):
+            docs = await reopened.similarity_search(str(n), k=1, filter_conditions={"kb_identifier": KB})
+            assert [doc.metadata["n"] for doc in docs] == [n], "reopened store must keep vectors after a delete"
+        reopened.close()
+    print("reopened after delete: vectors intact")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.rows, args.dim, 200, rng)
+    queries = clustered_vectors(args.queries, args.dim, 200, rng)
+
+    with tempfile.TemporaryDirectory() as exact_dir, tempfile.TemporaryDirectory() as ivf_dir:
+        stores = {
+            "exact": make_store(exact_dir, args.dim, queries, args.rows + 1, args.nprobe),
+            "ivf": make_store(ivf_dir, args.dim, queries, 1000, args.nprobe),
+        }
+        results = {}
+        for name, store in stores.items():
+            started = time.perf_counter()
+            for start in range(0, args.rows, 1000):
+                docs = [
+                    Document(page_content=f"chunk {n}", metadata={"kb_identifier": KB, "source": "bench.pdf", "n": n})
+                    for n in range(start, min(start + 1000, args.rows))
+                ]
+                await store.add_embedded_documents(docs, vectors[start:start + len(docs)].tolist())
+            insert_time = time.perf_counter() - started
+            results[name], times = await run_queries(store, args.queries, args.k)
+            print(
+                f"{name:<6} insert {args.rows / insert_time:8.0f} rows/s   "
+                f"search p50 {statistics.median(times) * 1000:6.2f} ms   p95 {np.percentile(times, 95) * 1000:6.2f} ms"
+            )
+
+        recall = np.mean([len(a & b) / args.k for a, b in zip(results["ivf"], results["exact"])])
+        print(f"ivf recall@{args.k} vs exact: {recall:.3f} (nprobe {args.nprobe})")
+
+        stores["ivf"].close()
+        reopened = make_store(ivf_dir, args.dim, queries, 1000, args.nprobe)
+        again, _ = await run_queries(reopened, args.queries, args.k)
+        assert again == results["ivf"], "reopened store must return the same results"
+        print("reopened from disk: same results")
+        reopened.close()
+        stores["exact"].close()
+    await check_reopen_after_delete(args.dim, rng)
+    store_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
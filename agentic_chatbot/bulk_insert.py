@@ -0,0 +1,97 @@
+"""
+Bounded, retried bulk inserts into document_vectors.
+
+Rows are grouped by a row-count and a serialized-size limit so no request
+body exceeds PostgREST limits, a few batches are sent in parallel, and a
+failed batch is retried on its own. Every row carries a deterministic
+metadata.chunk_id; before a retry the batch's ids are deleted, so a batch
+that actually committed before its response was lost is not duplicated.
+"""
+from typing import Dict, Iterator, List
+import asyncio
+import json
+import logging
+import time
+import uuid
+from postgrest.types import ReturnMethod
+from config import (
+    INSERT_BATCH_ROWS,
+    INSERT_BATCH_BYTES,
+    INSERT_MAX_IN_FLIGHT,
+    INSERT_RETRIES,
+    EMBEDDING_WIRE_DIGITS,
+)
+
+logger = logging.getLogger("voicebot")
+
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c1a8e-4f5b-4a53-9d1e-3c7c2b1f9a10")
+
+# Shared by every upload on this worker so concurrent jobs can't stack up requests
+_insert_slots = asyncio.Semaphore(INSERT_MAX_IN_FLIGHT)
+
+
+def make_chunk_id(kb_identifier: str, source: str, content_hash: str) -> str:
+    """Stable id for a chunk of a document in a knowledge base."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{kb_identifier}\x1f{source}\x1f{content_hash}"))
+
+
+def encode_vector(embedding, digits: int = EMBEDDING_WIRE_DIGITS) -> str:
+    """pgvector text literal with a fixed number of significant digits.
+
+    json.dumps writes up to 17 digits per float; float32 embeddings only
+    carry about 7, so this roughly halves the payload without losing
+    ranking precision.
+    """
+    return "[" + ",".join(f"{float(x):.{digits}g}" for x in embedding) + "]"
+
+
+def batch_rows(rows: List[dict], max_rows: int = INSERT_BATCH_ROWS, max_bytes: int = INSERT_BATCH_BYTES) -> Iterator[List[dict]]:
+    batch, size = [], 0
+    for row in rows:
+        row_size = len(json.dumps(row, ensure_ascii=False))
+        if batch and (len(batch) >= max_rows or size + row_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
+
+
+async def _insert_batch(supabase, table: str, batch: List[dict], retries: int):
+    chunk_ids = [row["metadata"]["chunk_id"] for row in batch]
+    for attempt in range(retries + 1):
+        try:
+            async with _insert_slots:
+                if attempt:
+                    # Remove whatever a previous attempt may have committed
+                    await supabase.table(table).delete().in_("metadata->>chunk_id", chunk_ids).execute()
+                await supabase.table(table).insert(batch, returning=ReturnMethod.minimal).execute()
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2 ** attempt
+            logger.warning(f"⚠️ Insert of {len(batch)} rows failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def bulk_insert_rows(
+    supabase,
+    rows: List[dict],
+    table: str = "document_vectors",
+    max_rows: int = INSERT_BATCH_ROWS,
+    max_bytes: int = INSERT_BATCH_BYTES,
+    retries: int = INSERT_RETRIES,
+) -> Dict[str, float]:
+    """Insert rows in bounded batches with limited parallelism; returns throughput stats."""
+    started = time.perf_counter()
+    batches = list(batch_rows(rows, max_rows=max_rows, max_bytes=max_bytes))
+    await asyncio.gather(*(_insert_batch(supabase, table, batch, retries) for batch in batches))
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": len(rows),
+        "batches": len(batches),
+        "seconds": elapsed,
+        "rows_per_second": len(rows) / elapsed if elapsed else 0.0,
+    }
@@ -34,4 +34,40 @@ def clean_markdown_for_tts(text):
     text = re.sub(r'[ \t]+', ' ', text)               # Multiple spaces/tabs
     text = text.strip()
 
-    return text
\ No newline at end of file
+    return text
+
+_SENTENCE_END = re.compile(r'(?<=[.!?。！？])\s+|\n+')
+
+
+class SentenceSplitter:
+    """
+    Incrementally cut a token stream into speakable sentences.
+
+    Text is fed as it arrives from the LLM; complete sentences are returned as
+    soon as the whitespace after their terminal punctuation has been seen, so a
+    trailing "3." is never split from "5" in "3.5".
+    """
+
+    def __init__(self, min_chars=20):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            # Merge very short fragments ("Sure.") into the next sentence
+            if len(candidate) < self.min_chars and "\n" not in match.group():
+                continue
+            if candidate:
+                sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder
@@ -8,13 +8,108 @@ GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
 # Model Configuration
 EMBEDDING_MODEL_NAME = "nomic-ai/nomic-embed-text-v1.5"
+# "torch" (sentence-transformers) or "onnx" (ONNX Runtime, int8 by default; needs onnxruntime)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL_PATH = os.environ.get("EMBEDDING_MODEL_PATH")  # Local checkpoint directory, for running offline
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quantized.onnx")  # Relative to the checkpoint
 ASR_MODEL = "whisper-large-v3-turbo"
 EMBEDDING_SIZE=768
+# Matryoshka output size for new knowledge bases (768, 512, 256, 128 or 64). Each KB keeps
+# the size it was created with. document_vectors.embedding and the similarity_search_with_filters
+# query_embedding parameter must be declared as plain `vector` (no fixed size) to mix sizes.
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", str(EMBEDDING_SIZE)))
+# nomic-embed expects task prefixes on both sides of the search
+EMBEDDING_DOCUMENT_PREFIX = "search_document: "
+EMBEDDING_QUERY_PREFIX = "search_query: "
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_WORKERS = int(os.environ.get("EMBEDDING_WORKERS", "1"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR")  # Persistent embedding cache is disabled when unset
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))  # x 1.5 KiB on disk
 GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY")
 MURF_API_KEY=os.environ.get("MURF_API_KEY")
+LLM_MODEL = "gemini-2.0-flash"
+LLM_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"  # Any OpenAI-compatible endpoint
+LLM_TEMPERATURE = 0.7
+# Compiled graphs (LLM client + MCP tools) are reused across connections for the same persona setup
+GRAPH_CACHE_TTL = int(os.environ.get("GRAPH_CACHE_TTL", "600"))
+GRAPH_CACHE_SIZE = 128
+# Per-user cache of persona/summary/MCP settings loaded at call setup
+RUNTIME_VARIABLES_TTL = int(os.environ.get("RUNTIME_VARIABLES_TTL", "60"))
+# Greeting text + audio per persona setup; older entries are served and refreshed in the background
+GREETING_CACHE_SIZE = 256
+GREETING_REFRESH_AFTER = int(os.environ.get("GREETING_REFRESH_AFTER", "3600"))
+# Vector Store Configuration
+# "supabase" (document_vectors + similarity_search_with_filters RPC) or "local" (in-process, memory-mapped).
+# Either way the knowledge base catalog behind the listing endpoints (kb_catalog) is kept in Supabase.
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "supabase")
+LOCAL_VECTOR_STORE_DIR = os.environ.get("LOCAL_VECTOR_STORE_DIR", "vector_store")
+LOCAL_IVF_MIN_ROWS = int(os.environ.get("LOCAL_IVF_MIN_ROWS", "20000"))  # Smaller knowledge bases are searched exactly
+LOCAL_IVF_NPROBE = int(os.environ.get("LOCAL_IVF_NPROBE", "8"))  # IVF lists scored per query
+# Hybrid retrieval: BM25 (sqlite FTS5, kept on this machine) fused with vector results.
+# LEXICAL_INDEX_DIR must be on persistent storage that every app instance serving the
+# knowledge bases sees; chunks missing from it (new host, lost disk) are only found
+# by vector search until their document is re-uploaded.
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "false").lower() == "true"
+LEXICAL_INDEX_DIR = os.environ.get("LEXICAL_INDEX_DIR", "lexical_index")
+SEARCH_TOP_K = 4  # Chunks handed to the LLM per search_docs call
+SEARCH_CANDIDATES = 10  # Depth of each ranking before fusion
+RRF_K = 60
+# Optional cross-encoder rerank of RERANK_CANDIDATES retrieved chunks
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")  # Or a local path
+RERANK_BACKEND = os.environ.get("RERANK_BACKEND", "torch")  # "torch" or "onnx" (needs onnxruntime)
+RERANK_CANDIDATES = 20
+RERANK_THRESHOLD = float(os.environ.get("RERANK_THRESHOLD", "0.1"))  # Relevance (sigmoid of the model's logit, 0-1) a chunk needs to be kept
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "150"))  # Beyond this, fall back to retrieval order
+RERANK_BATCH_SIZE = 32
+# Start knowledge base retrieval from the transcript while the LLM decides what to search for
+SPECULATIVE_RETRIEVAL = os.environ.get("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SPECULATIVE_MIN_SIMILARITY = 0.85  # Cosine between the tool query and the transcript needed to reuse the result
+
 # Text Processing Configuration
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Document Ingestion Configuration
+INGEST_QUEUE_MAXSIZE = int(os.environ.get("INGEST_QUEUE_MAXSIZE", "16"))  # Uploads waiting beyond this get a 429
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))  # Jobs processed concurrently
+INGEST_PROCESS_WORKERS = int(os.environ.get("INGEST_PROCESS_WORKERS", "2"))  # Processes for PDF parsing/chunking
+PDF_PAGES_PER_TASK = 25  # Page range extracted by one process pool task
+INGEST_JOB_RETENTION = 3600  # Seconds finished job statuses stay queryable
+# Bulk inserts into document_vectors are split by rows and serialized bytes
+INSERT_BATCH_ROWS = int(os.environ.get("INSERT_BATCH_ROWS", "200"))
+INSERT_BATCH_BYTES = int(os.environ.get("INSERT_BATCH_BYTES", str(1024 * 1024)))
+INSERT_MAX_IN_FLIGHT = int(os.environ.get("INSERT_MAX_IN_FLIGHT", "3"))
+INSERT_RETRIES = 3
+EMBEDDING_WIRE_DIGITS = 7  # Significant digits per vector component sent to pgvector
+
+# TTS Cache Configuration
+# Synthesized audio is cached by (normalized text, voice, format, sample rate)
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR")  # Disk tier is disabled when unset
+TTS_CACHE_DISK_MAX_BYTES = int(os.environ.get("TTS_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+TTS_CACHE_MAX_TEXT_CHARS = 400  # Longer replies rarely repeat and are streamed uncached
+TTS_CACHE_CHUNK_SIZE = 16 * 1024
+
+# Streaming Configuration
+# Clients can also opt in per connection by sending "streaming": true in the initial message
+STREAMING_TURNS = os.environ.get("STREAMING_TURNS", "false").lower() == "true"
+TTS_MAX_PARALLEL_SENTENCES = 2
+
+# Conversation Context Configuration
+# Per-call prompt: recent turns within this many tokens, older turns summarized in the background
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+# Tool output is not kept between turns (only the spoken exchange is); within a turn each
+# result is capped at this many characters
+TOOL_RESULT_MAX_CHARS = 6000
+# End-of-session personalization notes are queued on disk and written by a background worker
+SESSION_SUMMARY_QUEUE_PATH = os.environ.get("SESSION_SUMMARY_QUEUE_PATH", "session_summaries.db")
+SESSION_SUMMARY_COALESCE_SECONDS = 30  # Sessions the same user/persona ends within this window share one summary
+SESSION_SUMMARY_MIN_INTERVAL = float(os.environ.get("SESSION_SUMMARY_MIN_INTERVAL", "2.0"))  # Seconds between summary LLM calls
+SESSION_SUMMARY_MAX_ATTEMPTS = 5
+SESSION_SUMMARY_RETRY_BASE = 30  # Seconds; doubles with every failed attempt
+SESSION_SUMMARY_DRAIN_SECONDS = 20  # Shutdown waits this long for queued summaries; the rest stay on disk
+
 # CORS Configuration
 ALLOWED_ORIGINS = ["*"]
@@ -0,0 +1,118 @@
+"""
+Bounded conversation context for one call.
+
+The prompt for each turn is the system prompt, a rolling summary of the
+older part of the call, and as many recent turns as fit in the token
+budget. Turns that fall out of the window are folded into the summary by a
+background LLM call, so no turn ever waits for summarization; until the
+summary has caught up those turns stay in the prompt, so nothing is lost.
+Prompt size therefore levels off instead of growing with every turn.
+"""
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from typing import List, Optional
+import asyncio
+import logging
+from config import CONTEXT_TOKEN_BUDGET
+
+logger = logging.getLogger("voicebot")
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a voice call between a user and an assistant. "
+    "Merge the new part of the conversation into the summary so far. Keep names, numbers, "
+    "decisions, open questions and user preferences; drop small talk. Reply with the updated "
+    "summary only, in at most 200 words."
+)
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    # ~4 characters per token plus per-message overhead; close enough for budgeting
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return len(content) // 4 + 4
+
+
+def format_turns(turns: List[List[BaseMessage]]) -> str:
+    return "\n".join(
+        f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+        for turn in turns
+        for m in turn
+    )
+
+
+class ConversationContext:
+    def __init__(self, llm, system_messages: List[BaseMessage], token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.llm = llm
+        self.system_messages = list(system_messages)
+        self.token_budget = token_budget
+        self.turns: List[List[BaseMessage]] = []
+        self.summary = ""
+        self.summarized = 0  # turns[:summarized] are covered by the summary
+        self._summarizing: Optional[asyncio.Task] = None
+
+    def _budget_start(self) -> int:
+        """Index of the oldest turn that still fits in the budget, counting back from the newest."""
+        used = sum(estimate_tokens(m) for m in self.system_messages) + len(self.summary) // 4
+        start = len(self.turns)
+        while start > 0:
+            cost = sum(estimate_tokens(m) for m in self.turns[start - 1])
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            start -= 1
+        # Always keep the latest exchange, however long
+        return min(start, max(len(self.turns) - 1, 0))
+
+    def messages(self, pending: Optional[BaseMessage] = None) -> List[BaseMessage]:
+        """The prompt: system prompt with summary, the window of recent turns, then pending."""
+        system = list(self.system_messages)
+        if self.summary:
+            note = f"Summary of the earlier part of this call:\n{self.summary}"
+            if system:
+                system[0] = SystemMessage(content=f"{system[0].content}\n\n{note}")
+            else:
+                system = [SystemMessage(content=note)]
+        start = min(self._budget_start(), self.summarized)
+        messages = system + [m for turn in self.turns[start:] for m in turn]
+        if pending is not None:
+            messages.append(pending)
+        return messages
+
+    def add_turn(self, *messages: BaseMessage):
+        self.turns.append(list(messages))
+        self._maybe_summarize()
+
+    def transcript(self) -> str:
+        """The call as text: rolling summary, then the turns in the window."""
+        start = min(self._budget_start(), self.summarized)
+        text = format_turns(self.turns[start:])
+        if self.summary:
+            text = f"(Summary of the earlier part of the call)\n{self.summary}\n\n{text}"
+        return text
+
+    def token_estimate(self, pending: Optional[BaseMessage] = None) -> int:
+        return sum(estimate_tokens(m) for m in self.messages(pending))
+
+    def _maybe_summarize(self):
+        if self._summarizing is not None and not self._summarizing.done():
+            return  # Picked up again when the running update finishes
+        target = self._budget_start()
+        if target > self.summarized:
+            self._summarizing = asyncio.create_task(self._summarize(target))
+
+    async def _summarize(self, upto: int):
+        transcript = format_turns(self.turns[self.summarized:upto])
+        try:
+            response = await self.llm.ainvoke([
+                SystemMessage(content=SUMMARY_INSTRUCTIONS),
+                HumanMessage(content=f"Summary so far:\n{self.summary or '(none)'}\n\nNew part of the conversation:\n{transcript}"),
+            ])
+        except Exception as e:
+            logger.warning(f"⚠️ Conversation summary update failed, will retry next turn: {e}")
+            return
+        self.summary = response.content
+        self.summarized = upto
+        logger.info(f"📝 Conversation summary now covers {upto} turns")
+        self._maybe_summarize()
+
+    def close(self):
+        if self._summarizing is not None:
+            self._summarizing.cancel()
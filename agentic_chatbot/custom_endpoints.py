@@ -6,6 +6,7 @@ import uuid
 
 from auth import get_current_user
 from custom_supabase import insert_persona_to_supabase
+from greeting_service import schedule_greeting_prefetch
 
 
 class CreatePersonaRequest(BaseModel):
@@ -64,6 +65,7 @@ async def create_persona(
         print(
             f"✅ Persona created successfully for user {user_id}: {created_persona['name']}"
         )
+        schedule_greeting_prefetch(user_id, created_persona["id"], "user")
 
         return PersonaResponse(**created_persona)
 
@@ -161,6 +163,7 @@ async def activate_persona(
         print(
             f"✅ Activated {request.persona_source} persona {persona_id} for user {user_id}"
         )
+        schedule_greeting_prefetch(user_id, persona_id, request.persona_source)
 
         return SetActivePersonaResponse(**result)
 
@@ -245,6 +248,7 @@ async def update_persona(
         )
 
         print(f"✅ Updated custom persona {persona_id} for user {user_id}")
+        schedule_greeting_prefetch(user_id, persona_id, "user")
 
         return UpdatePersonaResponse(**result)
 
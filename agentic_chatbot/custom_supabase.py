@@ -5,7 +5,12 @@ import uuid
 from datetime import datetime
 from supabase import AsyncClient, acreate_client
 from auth import get_current_user, verify_token
+from config import RUNTIME_VARIABLES_TTL
+import asyncio
+import copy
 import os
+import time
+from types import SimpleNamespace
 
 supabase_client: AsyncClient = None
 _initialized = False
@@ -245,6 +250,7 @@ async def set_active_persona_for_user(
         print(
             f"✅ Set active persona {persona_id} ({persona_source}) for user {user_id}"
         )
+        invalidate_runtime_variables(user_id)
 
         return {
             "success": True,
@@ -332,6 +338,7 @@ async def set_inactive_persona_for_user(user_id: str) -> dict:
         ).execute()
 
         print(f"✅ Removed active persona mapping for user {user_id}")
+        invalidate_runtime_variables(user_id)
 
         return {
             "success": True,
@@ -413,6 +420,7 @@ async def update_persona_for_user(
         updated_persona = response.data[0]
 
         print(f"✅ Updated custom persona {persona_id} for user {user_id}")
+        invalidate_runtime_variables(user_id)
 
         return {
             "success": True,
@@ -446,17 +454,83 @@ async def update_persona_for_user(
 from map import MURF_VOICE_MAPPING
 
 
+# Per-user runtime variables cache: user_id -> (expires_at, runtime variables)
+_runtime_variables_cache = {}
+_runtime_variables_versions = {}
+
+
+def invalidate_runtime_variables(user_id: str):
+    """Forget cached runtime variables so the next call reloads them."""
+    _runtime_variables_versions[user_id] = _runtime_variables_versions.get(user_id, 0) + 1
+    _runtime_variables_cache.pop(user_id, None)
+
+
 async def get_user_runtime_variables(user_id: str) -> dict:
+    entry = _runtime_variables_cache.get(user_id)
+    if entry and entry[0] > time.monotonic():
+        return copy.deepcopy(entry[1])
+
+    version = _runtime_variables_versions.get(user_id, 0)
+    response_data = await load_user_runtime_variables(user_id)
+
+    # Don't cache a result that was invalidated while it was loading
+    if _runtime_variables_versions.get(user_id, 0) == version:
+        _runtime_variables_cache[user_id] = (
+            time.monotonic() + RUNTIME_VARIABLES_TTL,
+            response_data,
+        )
+    return copy.deepcopy(response_data)
+
+
+async def load_user_runtime_variables(
+    user_id: str, persona_id: Optional[str] = None, persona_source: Optional[str] = None
+) -> dict:
+    """
+    Load everything needed to start a call in two round-trip waves.
+
+    The active persona mapping, the user's session summaries and the user's
+    MCP servers don't depend on each other, so they are fetched concurrently;
+    only the persona row has to wait for the active persona id. Passing
+    persona_id/persona_source loads that persona instead of the active one.
+    """
     try:
         supabase = await get_supabase()
-        active_persona_info = await get_active_persona_for_user(user_id)
-        if not active_persona_info["success"]:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Failed to get active persona",
+
+        async def fetch_active_persona():
+            if persona_id:
+                return SimpleNamespace(
+                    data=[
+                        {
+                            "active_persona_id": persona_id,
+                            "persona_source": persona_source or "user",
+                        }
+                    ]
+                )
+            return (
+                await supabase.table("user_active_persona")
+                .select("active_persona_id, persona_source")
+                .eq("user_id", user_id)
+                .execute()
             )
-        persona_id = active_persona_info["active_persona_id"]
-        persona_source = active_persona_info["persona_source"]
+
+        active_ref, summaries_response, mcp_response = await asyncio.gather(
+            fetch_active_persona(),
+            supabase.table("user_persona_session_summary")
+            .select("persona_id, session_summary")
+            .eq("user_id", user_id)
+            .execute(),
+            supabase.table("mcp_servers")
+            .select("server_id, name, url, bearer_token, created_at")
+            .eq("user_id", user_id)  # Ensure server belongs to user for security
+            .execute(),
+        )
+
+        if active_ref.data:
+            persona_id = active_ref.data[0]["active_persona_id"]
+            persona_source = active_ref.data[0]["persona_source"]
+        else:
+            persona_id = "d3134d26-75cb-43ee-b7e9-a13f36da9154"
+            persona_source = "default"
 
         # Initialize variables
         system_prompt = ""
@@ -497,30 +571,19 @@ async def get_user_runtime_variables(user_id: str) -> dict:
                 accent = persona_response.data[0]["accent"] or "en-IN"
                 mcp_server_id = persona_response.data[0].get("mcp_server_id")
 
-        # Fetch previous session summary
+        # Previous session summary for this persona
         session_summary = ""
-        summary_response = (
-            await supabase.table("user_persona_session_summary")
-            .select("session_summary")
-            .eq("user_id", user_id)
-            .eq("persona_id", persona_id)
-            .execute()
-        )
-        if summary_response.data and summary_response.data[0]["session_summary"]:
-            session_summary = summary_response.data[0]["session_summary"]
+        for row in summaries_response.data or []:
+            if row["persona_id"] == persona_id and row["session_summary"]:
+                session_summary = row["session_summary"]
+                break
 
-        # Fetch MCP server details if mcp_server_id is set
+        # MCP server details if mcp_server_id is set
         mcp_server_details = None
         if mcp_server_id:
-            mcp_response = (
-                await supabase.table("mcp_servers")
-                .select("server_id, name, url, bearer_token, created_at")
-                .eq("server_id", mcp_server_id)
-                .eq("user_id", user_id)  # Ensure server belongs to user for security
-                .execute()
-            )
-            if mcp_response.data:
-                mcp = mcp_response.data[0]
+            for mcp in mcp_response.data or []:
+                if str(mcp["server_id"]) != str(mcp_server_id):
+                    continue
                 mcp_server_details = {
                     "id": str(mcp["server_id"]),
                     "name": mcp["name"],
@@ -530,6 +593,7 @@ async def get_user_runtime_variables(user_id: str) -> dict:
                     "status": "active",
                 }
                 print(f"✅ Retrieved MCP server details: {mcp['name']}")
+                break
 
         print(
             f"✅ Retrieved runtime variables for user {user_id}, persona {persona_id}"
@@ -602,6 +666,7 @@ async def upsert_session_summary(
             )
 
         print(f"✅ Stored session summary for user {user_id}, persona {persona_id}")
+        invalidate_runtime_variables(user_id)
 
         return {
             "success": True,
@@ -710,6 +775,10 @@ async def create_mcp_server_for_user(
 
         print(f"✅ Created MCP server {created_server['server_id']} for user {user_id}")
 
+        from llm_service import invalidate_graph_cache
+
+        invalidate_graph_cache(url=url)
+
         return {
             "success": True,
             "user_id": user_id,
@@ -754,6 +823,11 @@ async def delete_mcp_server_for_user(user_id: str, server_id: str) -> dict:
 
         print(f"✅ Deleted MCP server {server_id} ({server_name}) for user {user_id}")
 
+        from llm_service import invalidate_graph_cache
+
+        invalidate_graph_cache(server_id=server_id)
+        invalidate_runtime_variables(user_id)
+
         return {
             "success": True,
             "user_id": user_id,
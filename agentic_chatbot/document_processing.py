@@ -0,0 +1,46 @@
+"""
+Streaming chunking for document ingestion.
+
+Pages are fed one at a time and chunks come out as soon as they can no
+longer change, so the whole document text is never materialized.
+"""
+from typing import List
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+
+class StreamingChunker:
+    """
+    RecursiveCharacterTextSplitter over a stream of pages.
+
+    Pages are joined with "\\n" as the old whole-document path did. Once the
+    buffer holds a few chunks' worth of text it is split; every chunk but
+    the last is emitted, and the buffer restarts at the last chunk, which
+    may continue on the next page. Chunks therefore keep CHUNK_SIZE and
+    CHUNK_OVERLAP across page boundaries while the buffer stays bounded.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self.window = chunk_size * 4
+        self._buffer = None
+
+    def feed(self, page: str) -> List[str]:
+        self._buffer = page if self._buffer is None else self._buffer + "\n" + page
+        if len(self._buffer) < self.window:
+            return []
+        chunks = self.splitter.split_text(self._buffer)
+        if len(chunks) < 2:
+            return []
+        tail = chunks[-1]
+        self._buffer = self._buffer[self._buffer.rfind(tail):]
+        return chunks[:-1]
+
+    def flush(self) -> List[str]:
+        if self._buffer is None:
+            return []
+        chunks = self.splitter.split_text(self._buffer)
+        self._buffer = None
+        return chunks
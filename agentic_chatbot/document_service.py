@@ -1,58 +1,223 @@
-from fastapi import UploadFile
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
-import pdfplumber
-from rag_service import vectorstore
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from langchain_core.documents import Document
+from typing import Callable, List, Optional
+from rag_service import vectorstore, lexical_index
+from embedding_service import embed_documents
+from document_processing import StreamingChunker
+from pdf_extraction import iter_pdf_pages
+from bulk_insert import make_chunk_id
+from kb_catalog import record_document
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_DIM, INSERT_BATCH_ROWS, INSERT_MAX_IN_FLIGHT
 from datetime import datetime
+import asyncio
+import hashlib
+import logging
 
-def read_pdf(file: UploadFile) -> str:
-    with pdfplumber.open(file.file) as pdf:
-        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-    return text
+logger = logging.getLogger("voicebot")
 
-async def process_document_upload(file: UploadFile, userid: str, knowledge_base: str):
-    try:
-        filename = file.filename
-        if not filename.lower().endswith(".pdf"):
-            return {"error": "Only PDF files are supported"}
-
-        # Read PDF
-        with pdfplumber.open(file.file) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-
-        # Chunk text
-        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        chunks = splitter.split_text(text)
-
-        # Create knowledge base identifier by concatenating userid and knowledge_base
-        kb_identifier = f"{userid}_{knowledge_base}"
-
-        # Batch create Document objects with metadata including knowledge base
-        upload_date = datetime.now().isoformat()
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "source": filename,
-                    "userid": userid,
-                    "knowledge_base": knowledge_base,
-                    "kb_identifier": kb_identifier,  # Combined identifier for filtering
-                    "upload_date": upload_date
-                }
+# progress(stage, done, total)
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+
+def _no_progress(stage: str, done: int, total: Optional[int]):
+    pass
+
+
+async def process_document_upload(
+    path: str,
+    filename: str,
+    userid: str,
+    knowledge_base: str,
+    progress: ProgressCallback = _no_progress,
+):
+    """
+    Ingest a PDF saved at path as a streaming pipeline.
+
+    Every chunk carries a content_hash. Chunks this document already has in
+    the knowledge base are kept as they are, chunks another document in the
+    knowledge base already embedded reuse that stored embedding, and only
+    new text is embedded. Once the upload is complete, rows of the previous
+    version of the document that are no longer present are deleted, so
+    re-uploading a changed file only touches what changed.
+
+    Pages (extracted in parallel) flow into the streaming chunker, chunks
+    are grouped into embedding batches, and embedded chunks are inserted in
+    the background in groups of INSERT_BATCH_ROWS while embedding goes on.
+    Peak memory is one chunking window plus a few insert groups, whatever
+    the size of the document. Progress is reported per stage.
+    """
+    # Create knowledge base identifier by concatenating userid and knowledge_base
+    kb_identifier = f"{userid}_{knowledge_base}"
+    upload_date = datetime.now().isoformat()
+
+    page_count = None
+    pages_done = 0
+    chunks_done = 0
+    chunks_embedded = 0
+    chunks_reused = 0
+    chunks_inserted = 0
+
+    # Hashes already stored for this document, and for the knowledge base as a whole
+    existing = await vectorstore.get_chunk_index(kb_identifier)
+    own_rows = [row for row in existing if row["source"] == filename]
+    own_hashes = {row["content_hash"] for row in own_rows}
+    kb_hashes = {row["content_hash"] for row in existing if row["content_hash"]}
+    seen_hashes = set()
+    total_chars = 0
+    # A knowledge base keeps the embedding size it was created with
+    embedding_dim = EMBEDDING_DIM
+    if existing:
+        embedding_dim = await vectorstore.get_kb_embedding_dim(kb_identifier) or EMBEDDING_DIM
+
+    def set_page_count(count):
+        nonlocal page_count
+        page_count = count
+        progress("parse", 0, count)
+
+    embedded_docs: List[Document] = []
+    embedded_vectors: List[List[float]] = []
+    inserts: List[asyncio.Task] = []
+
+    async def insert_group(docs, embeddings):
+        nonlocal chunks_inserted
+        await vectorstore.add_embedded_documents(docs, embeddings)
+        if lexical_index is not None:
+            await lexical_index.add(docs)
+        chunks_inserted += len(docs)
+        progress("insert", chunks_inserted, None)
+
+    async def flush_inserts():
+        inserts.append(asyncio.create_task(insert_group(embedded_docs[:], embedded_vectors[:])))
+        embedded_docs.clear()
+        embedded_vectors.clear()
+        # Keep a bounded number of groups in memory; the oldest is usually done by now
+        while len(inserts) > INSERT_MAX_IN_FLIGHT:
+            await inserts.pop(0)
+
+    def make_doc(chunk: str, content_hash: str) -> Document:
+        # Create Document object with metadata including knowledge base
+        return Document(
+            page_content=chunk,
+            metadata={
+                "source": filename,
+                "userid": userid,
+                "knowledge_base": knowledge_base,
+                "kb_identifier": kb_identifier,  # Combined identifier for filtering
+                "upload_date": upload_date,
+                "content_hash": content_hash,
+                "embedding_dim": embedding_dim,
+                "chunk_id": make_chunk_id(kb_identifier, filename, content_hash),
+            }
+        )
+
+    async def ingest_batch(chunks: List[str]):
+        nonlocal chunks_embedded, chunks_reused, total_chars
+        to_embed, to_copy, kept = [], [], []
+        for chunk in chunks:
+            content_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            if content_hash in seen_hashes:
+                continue  # Repeated within this document
+            seen_hashes.add(content_hash)
+            total_chars += len(chunk)
+            if content_hash in own_hashes:
+                chunks_reused += 1  # Unchanged since the last upload; row is kept
+                kept.append(make_doc(chunk, content_hash))
+            elif content_hash in kb_hashes:
+                to_copy.append(make_doc(chunk, content_hash))
+            else:
+                to_embed.append(make_doc(chunk, content_hash))
+
+        # The BM25 index is local to this machine and may be missing these (new host,
+        # fresh disk); re-indexing replaces existing entries, so re-uploading restores it
+        if kept and lexical_index is not None:
+            await lexical_index.add(kept)
+
+        if to_copy:
+            stored = await vectorstore.get_embeddings_by_hash(
+                kb_identifier, [doc.metadata["content_hash"] for doc in to_copy]
             )
-            for chunk in chunks
-        ]
+            for doc in to_copy:
+                embedding = stored.get(doc.metadata["content_hash"])
+                if embedding is None:
+                    to_embed.append(doc)  # Deleted since we looked
+                else:
+                    chunks_reused += 1
+                    embedded_docs.append(doc)
+                    embedded_vectors.append(embedding)
+
+        if to_embed:
+            embeddings = await embed_documents([doc.page_content for doc in to_embed], dim=embedding_dim)
+            chunks_embedded += len(to_embed)
+            progress("embed", chunks_embedded, None)
+            embedded_docs.extend(to_embed)
+            embedded_vectors.extend(embeddings)
+        if len(embedded_docs) >= INSERT_BATCH_ROWS:
+            await flush_inserts()
+
+    def chunked(new_chunks: List[str]):
+        nonlocal chunks_done
+        batch.extend(new_chunks)
+        chunks_done += len(new_chunks)
+        if new_chunks:
+            progress("chunk", chunks_done, None)
+
+    chunker = StreamingChunker()
+    batch: List[str] = []
+    try:
+        async for page in iter_pdf_pages(path, on_page_count=set_page_count):
+            pages_done += 1
+            progress("parse", pages_done, page_count)
+            chunked(chunker.feed(page))
+            while len(batch) >= EMBEDDING_BATCH_SIZE:
+                await ingest_batch(batch[:EMBEDDING_BATCH_SIZE])
+                del batch[:EMBEDDING_BATCH_SIZE]
 
-        # ✅ Batch embed & insert
-        await vectorstore.add_documents(docs)
+        chunked(chunker.flush())
+        progress("chunk", chunks_done, chunks_done)
+        for start in range(0, len(batch), EMBEDDING_BATCH_SIZE):
+            await ingest_batch(batch[start:start + EMBEDDING_BATCH_SIZE])
+        progress("embed", chunks_embedded, chunks_embedded)
+        if embedded_docs:
+            await flush_inserts()
+        await asyncio.gather(*inserts)
+    except BaseException:
+        # Don't leave insert groups running after the job has failed
+        for task in inserts:
+            task.cancel()
+        raise
+    progress("insert", chunks_inserted, chunks_inserted)
 
-        return {
-            "status": "uploaded",
-            "chunks": len(docs),
-            "file": filename,
-            "knowledge_base": knowledge_base
-        }
+    # Rows from the previous version of this document that the new one no longer has
+    # (and duplicate rows left behind by uploads made before chunks were hashed)
+    kept, stale = set(), []
+    for row in own_rows:
+        if row["content_hash"] in seen_hashes and row["content_hash"] not in kept:
+            kept.add(row["content_hash"])
+        else:
+            stale.append(row["id"])
+    if stale:
+        await vectorstore.delete_chunks(stale)
+        if lexical_index is not None:
+            stale_hashes = {row["content_hash"] for row in own_rows if row["content_hash"] not in seen_hashes}
+            await lexical_index.delete(kb_identifier, filename, list(stale_hashes))
+    await record_document(
+        userid, knowledge_base, filename,
+        chunk_count=len(seen_hashes),
+        total_chars=total_chars,
+        page_count=page_count,
+        upload_date=upload_date,
+        embedding_dim=embedding_dim,
+    )
+    logger.info(
+        f"📄 Ingested '{filename}': {len(seen_hashes)} chunks, {chunks_embedded} embedded, "
+        f"{chunks_reused} reused, {len(stale)} stale removed"
+    )
 
-    except Exception as e:
-        return {"error": str(e)}
+    return {
+        "status": "uploaded",
+        "chunks": len(seen_hashes),
+        "embedded": chunks_embedded,
+        "reused": chunks_reused,
+        "removed": len(stale),
+        "file": filename,
+        "knowledge_base": knowledge_base
+    }
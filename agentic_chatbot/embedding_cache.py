@@ -0,0 +1,127 @@
+"""
+Persistent embedding cache.
+
+Vectors live in a fixed-size float16 array memory-mapped from
+<dir>/vectors.f16, one slot per entry; an sqlite index maps the sha256 of
+(model name, task prefix, text) to its slot and last use time. When every
+slot is taken the least recently used entries are evicted and their slots
+reused, so the cache never grows past max_entries * dim * 2 bytes.
+
+All methods are synchronous and meant to run on the embedding executor,
+next to the model call they save.
+"""
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger("voicebot")
+
+
+class DiskEmbeddingCache:
+    def __init__(self, directory: str, dim: int, max_entries: int):
+        self.directory = directory
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+        vectors_path = os.path.join(directory, "vectors.f16")
+        layout = f"{dim}x{max_entries}"
+        stored = self._db.execute("SELECT value FROM meta WHERE name = 'layout'").fetchone()
+        if stored is None or stored[0] != layout or not os.path.exists(vectors_path):
+            # New cache, or resized: start over rather than misread old slots
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('layout', ?)", (layout,))
+            self._db.commit()
+            mode = "w+"
+        else:
+            mode = "r+"
+        self._vectors = np.memmap(vectors_path, dtype=np.float16, mode=mode, shape=(max_entries, dim))
+        self._size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        logger.info(f"💾 Embedding cache at {directory}: {self._size}/{max_entries} entries")
+
+    @staticmethod
+    def key(model_name: str, prefix: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model_name}\x1f{prefix}\x1f{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[List[float]]]:
+        """Cached vector for each key, or None where it is missing."""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        if not keys:
+            return results
+        with self._lock:
+            slots: Dict[bytes, int] = {}
+            unique = list(set(keys))
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                slots.update(self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part
+                ).fetchall())
+            if slots:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in slots]
+                )
+                self._db.commit()
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is not None:
+                    results[i] = self._vectors[slot].astype(np.float32).tolist()
+            found = sum(1 for result in results if result is not None)
+            self.hits += found
+            self.misses += len(keys) - found
+        return results
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                elif self._size < self.max_entries:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    # Reuse the slot of the least recently used entry
+                    evicted_key, slot = self._db.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                    ).fetchone()
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (evicted_key,))
+                # Vector first, so a committed index row never points at stale data
+                self._vectors[slot] = np.asarray(vector, dtype=np.float16)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, slot, now)
+                )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "max_size": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._db.close()
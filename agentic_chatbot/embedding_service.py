@@ -0,0 +1,196 @@
+from langchain_huggingface import HuggingFaceEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import numpy as np
+from metrics import register_gauges
+from embedding_cache import DiskEmbeddingCache
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_PATH,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_SIZE,
+    EMBEDDING_DOCUMENT_PREFIX,
+    EMBEDDING_QUERY_PREFIX,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_WORKERS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+)
+
+
+def create_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """Embeddings for the configured backend; both give L2-normalized 768-d vectors."""
+    model = EMBEDDING_MODEL_PATH or EMBEDDING_MODEL_NAME
+    if backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(model, EMBEDDING_ONNX_FILE)
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected 'torch' or 'onnx')")
+    return HuggingFaceEmbeddings(
+        model_name=model,
+        model_kwargs={
+            "device": "cpu",
+            "trust_remote_code": True
+        },
+        encode_kwargs={
+            "normalize_embeddings": True
+        }
+    )
+
+
+embedding_model = create_embedding_model()
+# Cache keys include the backend: int8 vectors are close to, not equal to, fp32 ones
+EMBEDDING_CACHE_MODEL_ID = f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}"
+
+# Dedicated pool so model inference never runs on the event loop thread.
+# PyTorch and ONNX Runtime release the GIL while encoding, so threads are enough and the
+# model only has to be loaded once per worker.
+embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding"
+)
+
+
+# Shared by uploads and queries; survives restarts. None when EMBEDDING_CACHE_DIR is unset.
+disk_embedding_cache = (
+    DiskEmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_SIZE, EMBEDDING_CACHE_MAX_ENTRIES)
+    if EMBEDDING_CACHE_DIR else None
+)
+if disk_embedding_cache is not None:
+    register_gauges("disk_embedding_cache", disk_embedding_cache.stats)
+
+
+def _embed_with_disk_cache(
+    prefix: str, texts: List[str], compute: Callable[[List[str]], List[List[float]]]
+) -> List[List[float]]:
+    """Serve texts from the disk cache and run compute() on the misses only."""
+    if disk_embedding_cache is None:
+        return compute([prefix + text for text in texts])
+    keys = [DiskEmbeddingCache.key(EMBEDDING_CACHE_MODEL_ID, prefix, text) for text in texts]
+    embeddings = disk_embedding_cache.get_many(keys)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        computed = compute([prefix + texts[i] for i in missing])
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+        disk_embedding_cache.put_many([keys[i] for i in missing], computed)
+    return embeddings
+
+
+def embed_documents_sync(texts: List[str]) -> List[List[float]]:
+    """Embed a batch of document chunks with the nomic document prefix."""
+    return _embed_with_disk_cache(EMBEDDING_DOCUMENT_PREFIX, texts, embedding_model.embed_documents)
+
+
+def embed_query_sync(query: str) -> List[float]:
+    """Embed a search query with the nomic query prefix."""
+    return _embed_with_disk_cache(
+        EMBEDDING_QUERY_PREFIX, [query], lambda texts: [embedding_model.embed_query(texts[0])]
+    )[0]
+
+
+def truncate_embeddings(embeddings: List[List[float]], dim: Optional[int]) -> List[List[float]]:
+    """
+    Matryoshka truncation as nomic-embed-text-v1.5 is trained for: layer
+    norm over the full vector, keep the first dim components, L2 normalize.
+    Full-size vectors are returned untouched.
+    """
+    if not dim or dim >= EMBEDDING_SIZE:
+        return embeddings
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = (vectors - vectors.mean(axis=1, keepdims=True)) / np.sqrt(
+        vectors.var(axis=1, keepdims=True) + 1e-5
+    )
+    vectors = vectors[:, :dim]
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.tolist()
+
+
+async def embed_documents(
+    texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE, dim: Optional[int] = None
+) -> List[List[float]]:
+    """Embed document chunks in batches on the embedding executor, truncated to dim."""
+    loop = asyncio.get_running_loop()
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        embeddings.extend(
+            await loop.run_in_executor(embedding_executor, embed_documents_sync, batch)
+        )
+    return truncate_embeddings(embeddings, dim)
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings keyed on (model name, normalized query)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.casefold().split())
+
+    def get(self, key: Tuple[str, str]):
+        embedding = self._entries.get(key)
+        if embedding is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return embedding
+
+    def put(self, key: Tuple[str, str], embedding: List[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_SIZE)
+register_gauges("query_embedding_cache", query_embedding_cache.stats)
+# Identical queries arriving together share one model call
+_inflight_queries: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+async def embed_query(query: str, dim: Optional[int] = None) -> List[float]:
+    """Embed a search query on the embedding executor, served from the LRU when possible.
+
+    Caches hold full-size vectors; dim truncates the result to match the
+    knowledge base being searched.
+    """
+    return truncate_embeddings([await _embed_query_full(query)], dim)[0]
+
+
+async def _embed_query_full(query: str) -> List[float]:
+    normalized = QueryEmbeddingCache.normalize(query)
+    key = (EMBEDDING_CACHE_MODEL_ID, normalized)
+
+    embedding = query_embedding_cache.get(key)
+    if embedding is not None:
+        return embedding
+    if key in _inflight_queries:
+        return await asyncio.shield(_inflight_queries[key])
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(embedding_executor, embed_query_sync, normalized)
+    _inflight_queries[key] = future
+    try:
+        embedding = await asyncio.shield(future)
+    finally:
+        _inflight_queries.pop(key, None)
+    query_embedding_cache.put(key, embedding)
+    return embedding
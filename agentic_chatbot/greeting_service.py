@@ -0,0 +1,139 @@
+from langchain_core.messages import HumanMessage, SystemMessage
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import asyncio
+import hashlib
+import logging
+import time
+from audio_services import murf_tts
+from clean import clean_markdown_for_tts
+from config import GREETING_CACHE_SIZE, GREETING_REFRESH_AFTER
+from custom_supabase import load_user_runtime_variables
+from llm_service import create_graph, build_system_prompt
+
+logger = logging.getLogger("voicebot")
+
+GREETING_REQUEST = "Generate a greeting for the user, state who you are and how can you help the user"
+DEFAULT_VOICE_ID = "en-IN-isha"
+
+
+class Greeting(NamedTuple):
+    text: str
+    audio: bytes
+    created_at: float
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def persona_greeting_key(rt_var: dict, system_prompt: str) -> tuple:
+    """Cache key: persona id + prompt hash + voice id + session summary hash."""
+    return (
+        rt_var["active_persona_id"],
+        _digest(system_prompt),
+        rt_var["accent"],
+        _digest(rt_var["session_summary"]),
+    )
+
+
+ANONYMOUS_GREETING_KEY = ("anonymous", "", DEFAULT_VOICE_ID, "")
+
+_greetings: "OrderedDict[tuple, Greeting]" = OrderedDict()
+_refreshes = {}
+_background_tasks = set()
+
+
+async def generate_greeting(graph, messages, config, tts_kwargs) -> Greeting:
+    """Ask the LLM for a greeting and synthesize it."""
+    response = await graph.ainvoke(
+        {"messages": list(messages) + [HumanMessage(GREETING_REQUEST)]}, config=config
+    )
+    text = response["messages"][-1].content
+    audio = await murf_tts(clean_markdown_for_tts(text), **tts_kwargs)
+    return Greeting(text=text, audio=audio, created_at=time.time())
+
+
+async def refresh_greeting(key: tuple, graph, messages, config, tts_kwargs) -> Greeting:
+    """Regenerate and store the greeting for a key; concurrent refreshes share one run."""
+    task = _refreshes.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _generate_and_store(key, graph, messages, config, tts_kwargs)
+        )
+        _refreshes[key] = task
+    return await asyncio.shield(task)
+
+
+async def _generate_and_store(key, graph, messages, config, tts_kwargs) -> Greeting:
+    try:
+        greeting = await generate_greeting(graph, messages, config, tts_kwargs)
+    finally:
+        _refreshes.pop(key, None)
+    _greetings[key] = greeting
+    _greetings.move_to_end(key)
+    while len(_greetings) > GREETING_CACHE_SIZE:
+        _greetings.popitem(last=False)
+    return greeting
+
+
+async def get_greeting(key: tuple, graph, messages, config, tts_kwargs) -> Greeting:
+    """
+    Return the greeting for a persona setup.
+
+    Cached greetings are served immediately; stale ones are regenerated in the
+    background for the next caller. Only a cold cache waits for LLM + TTS.
+    """
+    greeting = _greetings.get(key)
+    if greeting is None:
+        logger.info("👋 Greeting cache miss, generating")
+        return await refresh_greeting(key, graph, messages, config, tts_kwargs)
+
+    _greetings.move_to_end(key)
+    if time.time() - greeting.created_at > GREETING_REFRESH_AFTER and key not in _refreshes:
+        _spawn(refresh_greeting(key, graph, list(messages), config, dict(tts_kwargs)))
+    return greeting
+
+
+async def prefetch_greeting(
+    user_id: str, persona_id: Optional[str] = None, persona_source: Optional[str] = None
+):
+    """Fill the greeting cache for a user's persona (the active one by default)."""
+    rt_var = await load_user_runtime_variables(user_id, persona_id, persona_source)
+    graph = await create_graph(
+        kb_tool=rt_var["knowledge_base"] != "none", mcp_config=rt_var.get("mcp_server")
+    )
+    system_prompt = build_system_prompt(rt_var)
+    config = {
+        "configurable": {
+            "thread_id": user_id,
+            "knowledge_base": rt_var["knowledge_base"],
+        }
+    }
+    await refresh_greeting(
+        persona_greeting_key(rt_var, system_prompt),
+        graph,
+        [SystemMessage(content=system_prompt)],
+        config,
+        {"voice_id": rt_var["accent"]},
+    )
+    logger.info(f"👋 Prefetched greeting for user {user_id}, persona {rt_var['active_persona_id']}")
+
+
+def schedule_greeting_prefetch(
+    user_id: str, persona_id: Optional[str] = None, persona_source: Optional[str] = None
+):
+    """Prefetch a greeting in the background without blocking the caller."""
+    _spawn(prefetch_greeting(user_id, persona_id, persona_source))
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+
+
+def _background_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Greeting refresh failed: {task.exception()}")
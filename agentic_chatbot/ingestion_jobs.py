@@ -0,0 +1,155 @@
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from config import INGEST_QUEUE_MAXSIZE, INGEST_WORKERS, INGEST_JOB_RETENTION
+from document_service import process_document_upload
+
+logger = logging.getLogger("voicebot")
+
+STAGES = ("parse", "chunk", "embed", "insert")
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+    """Status of one document upload as it moves through the ingestion stages."""
+
+    def __init__(self, userid: str, knowledge_base: str, filename: str, path: str):
+        self.id = str(uuid.uuid4())
+        self.userid = userid
+        self.knowledge_base = knowledge_base
+        self.filename = filename
+        self.path = path
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.stages = {
+            stage: {"status": "pending", "done": 0, "total": None} for stage in STAGES
+        }
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def update_progress(self, stage: str, done: int, total: Optional[int]):
+        self.stages[stage].update(
+            status="completed" if total is not None and done >= total else "running",
+            done=done,
+            total=total,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "file": self.filename,
+            "knowledge_base": self.knowledge_base,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+_jobs: Dict[str, IngestionJob] = {}
+_queue: Optional[asyncio.Queue] = None
+_workers = []
+
+
+def _prune_finished_jobs():
+    cutoff = time.time() - INGEST_JOB_RETENTION
+    for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def _spool_upload(file: UploadFile) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        file.file.seek(0)
+        shutil.copyfileobj(file.file, tmp)
+        return tmp.name
+
+
+async def submit_upload(file: UploadFile, userid: str, knowledge_base: str) -> IngestionJob:
+    """Queue an uploaded PDF for background ingestion and return its job right away."""
+    if _queue is None:
+        raise RuntimeError("Ingestion workers are not running")
+    if _queue.full():
+        raise IngestionQueueFull()
+
+    _prune_finished_jobs()
+    # The request's UploadFile is closed once the response is sent, so keep a copy
+    path = await run_in_threadpool(_spool_upload, file)
+    job = IngestionJob(userid, knowledge_base, file.filename, path)
+    _jobs[job.id] = job
+    try:
+        _queue.put_nowait(job)
+    except asyncio.QueueFull:
+        del _jobs[job.id]
+        os.remove(path)
+        raise IngestionQueueFull()
+    logger.info(f"📥 Queued ingestion job {job.id} for '{job.filename}' ({_queue.qsize()} waiting)")
+    return job
+
+
+def get_job(job_id: str, userid: str) -> Optional[IngestionJob]:
+    job = _jobs.get(job_id)
+    if job is None or job.userid != userid:
+        return None
+    return job
+
+
+async def _run_job(job: IngestionJob):
+    job.status = "running"
+    try:
+        job.result = await process_document_upload(
+            job.path,
+            job.filename,
+            userid=job.userid,
+            knowledge_base=job.knowledge_base,
+            progress=job.update_progress,
+        )
+        job.status = "completed"
+        logger.info(f"✅ Ingestion job {job.id} completed: {job.result}")
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        for stage in job.stages.values():
+            if stage["status"] == "running":
+                stage["status"] = "failed"
+        logger.exception(f"❌ Ingestion job {job.id} failed: {e}")
+    finally:
+        job.finished_at = time.time()
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+
+async def _worker():
+    while True:
+        job = await _queue.get()
+        try:
+            await _run_job(job)
+        finally:
+            _queue.task_done()
+
+
+def start_ingestion_workers():
+    global _queue
+    _queue = asyncio.Queue(maxsize=INGEST_QUEUE_MAXSIZE)
+    for _ in range(INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    logger.info(f"🧵 Started {INGEST_WORKERS} ingestion workers (queue size {INGEST_QUEUE_MAXSIZE})")
+
+
+async def stop_ingestion_workers():
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
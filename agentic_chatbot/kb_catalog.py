@@ -0,0 +1,193 @@
+"""
+Catalog of knowledge bases and their documents.
+
+Listing used to scan document_vectors (one row per chunk) and dedupe in
+Python, so it got slower with every upload. Ingestion and document deletion
+now keep two small tables up to date, and the /knowledge_bases endpoints
+page through them; a listing costs the same however many chunks exist.
+
+The catalog always lives in Supabase, whatever VECTOR_STORE_BACKEND is set
+to; with the local backend only the chunks and vectors stay on this machine.
+
+Supabase schema:
+
+    create table knowledge_bases (
+        kb_identifier  text primary key,          -- "<userid>_<name>"
+        userid         text not null,
+        name           text not null,
+        document_count integer not null default 0,
+        chunk_count    integer not null default 0,
+        total_chars    bigint  not null default 0,
+        embedding_dim  integer,
+        updated_at     timestamptz not null default now()
+    );
+    create index knowledge_bases_userid_name on knowledge_bases (userid, name);
+
+    create table kb_documents (
+        id            bigint generated always as identity primary key,
+        kb_identifier text not null references knowledge_bases on delete cascade,
+        filename      text not null,
+        chunk_count   integer not null,
+        total_chars   bigint  not null,
+        page_count    integer,
+        upload_date   text,
+        unique (kb_identifier, filename)
+    );
+
+Existing knowledge bases can be added once with: python kb_catalog.py backfill
+"""
+from postgrest.types import CountMethod
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
+import logging
+import sys
+from custom_supabase import get_supabase
+from config import EMBEDDING_SIZE
+
+logger = logging.getLogger("voicebot")
+
+
+async def _refresh_kb_totals(userid: str, name: str, kb_identifier: str, embedding_dim: Optional[int] = None):
+    """Recompute a knowledge base's totals from its documents; drop it once it has none."""
+    supabase = await get_supabase()
+    response = await supabase.table("kb_documents") \
+        .select("chunk_count, total_chars") \
+        .eq("kb_identifier", kb_identifier) \
+        .execute()
+    documents = response.data
+    if not documents:
+        await supabase.table("knowledge_bases").delete().eq("kb_identifier", kb_identifier).execute()
+        return
+    row = {
+        "kb_identifier": kb_identifier,
+        "userid": userid,
+        "name": name,
+        "document_count": len(documents),
+        "chunk_count": sum(doc["chunk_count"] for doc in documents),
+        "total_chars": sum(doc["total_chars"] for doc in documents),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if embedding_dim is not None:
+        row["embedding_dim"] = embedding_dim
+    await supabase.table("knowledge_bases").upsert(row).execute()
+
+
+async def record_document(
+    userid: str,
+    knowledge_base: str,
+    filename: str,
+    chunk_count: int,
+    total_chars: int,
+    page_count: Optional[int] = None,
+    upload_date: Optional[str] = None,
+    embedding_dim: Optional[int] = None,
+):
+    """Add or update a document after ingestion."""
+    kb_identifier = f"{userid}_{knowledge_base}"
+    supabase = await get_supabase()
+    # The parent row must exist before the document references it
+    await supabase.table("knowledge_bases").upsert(
+        {"kb_identifier": kb_identifier, "userid": userid, "name": knowledge_base},
+        ignore_duplicates=True,
+    ).execute()
+    await supabase.table("kb_documents").upsert(
+        {
+            "kb_identifier": kb_identifier,
+            "filename": filename,
+            "chunk_count": chunk_count,
+            "total_chars": total_chars,
+            "page_count": page_count,
+            "upload_date": upload_date,
+        },
+        on_conflict="kb_identifier,filename",
+    ).execute()
+    await _refresh_kb_totals(userid, knowledge_base, kb_identifier, embedding_dim)
+
+
+async def remove_document(userid: str, knowledge_base: str, filename: str):
+    kb_identifier = f"{userid}_{knowledge_base}"
+    supabase = await get_supabase()
+    await supabase.table("kb_documents") \
+        .delete() \
+        .eq("kb_identifier", kb_identifier) \
+        .eq("filename", filename) \
+        .execute()
+    await _refresh_kb_totals(userid, knowledge_base, kb_identifier)
+
+
+async def list_knowledge_bases(userid: str, offset: int = 0, limit: int = 100) -> Tuple[List[str], int]:
+    """One page of the user's knowledge base names (sorted) and the total count."""
+    supabase = await get_supabase()
+    response = await supabase.table("knowledge_bases") \
+        .select("name", count=CountMethod.exact) \
+        .eq("userid", userid) \
+        .order("name") \
+        .range(offset, offset + limit - 1) \
+        .execute()
+    return [row["name"] for row in response.data], response.count or 0
+
+
+async def list_documents(userid: str, knowledge_base: str, offset: int = 0, limit: int = 100) -> Tuple[List[dict], int]:
+    """One page of a knowledge base's documents (by filename) and the total count."""
+    supabase = await get_supabase()
+    response = await supabase.table("kb_documents") \
+        .select("id, filename, chunk_count, total_chars, page_count, upload_date", count=CountMethod.exact) \
+        .eq("kb_identifier", f"{userid}_{knowledge_base}") \
+        .order("filename") \
+        .range(offset, offset + limit - 1) \
+        .execute()
+    documents = [
+        {
+            "id": str(row["id"]),
+            "filename": row["filename"],
+            "knowledge_base": knowledge_base,
+            "upload_date": row["upload_date"] or "Unknown",
+            "chunk_count": row["chunk_count"],
+            "total_chars": row["total_chars"],
+            "page_count": row["page_count"],
+        }
+        for row in response.data
+    ]
+    return documents, response.count or 0
+
+
+async def backfill_catalog():
+    """One-off: catalog every document already in document_vectors (a full scan)."""
+    supabase = await get_supabase()
+    documents = {}
+    page_size = 1000
+    offset = 0
+    while True:
+        response = await supabase.table("document_vectors") \
+            .select("id, kb_identifier:metadata->>kb_identifier, userid:metadata->>userid, "
+                    "knowledge_base:metadata->>knowledge_base, source:metadata->>source, "
+                    "upload_date:metadata->>upload_date, embedding_dim:metadata->>embedding_dim, content") \
+            .order("id") \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        for row in response.data:
+            if not (row["userid"] and row["knowledge_base"] and row["source"]):
+                continue
+            key = (row["userid"], row["knowledge_base"], row["source"])
+            doc = documents.setdefault(key, {"chunks": 0, "chars": 0, "upload_date": row["upload_date"],
+                                             "embedding_dim": row["embedding_dim"]})
+            doc["chunks"] += 1
+            doc["chars"] += len(row["content"] or "")
+        if len(response.data) < page_size:
+            break
+        offset += page_size
+
+    for (userid, knowledge_base, filename), doc in documents.items():
+        await record_document(
+            userid, knowledge_base, filename, doc["chunks"], doc["chars"],
+            upload_date=doc["upload_date"], embedding_dim=int(doc["embedding_dim"] or EMBEDDING_SIZE),
+        )
+    print(f"✅ Catalogued {len(documents)} documents")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        asyncio.run(backfill_catalog())
+    else:
+        print("Usage: python kb_catalog.py backfill")
@@ -0,0 +1,156 @@
+"""
+Per-knowledge-base BM25 index for hybrid retrieval.
+
+Dense embeddings blur product names, model numbers and proper nouns, which
+is exactly what callers tend to ask about. Every chunk is also indexed in an
+sqlite FTS5 table (one per knowledge base, porter stemming, BM25 ranking),
+and search_docs fuses the lexical ranking with the vector ranking by
+reciprocal rank fusion.
+
+Chunks are keyed by (source, content_hash), matching the vector store rows.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from typing import Callable, Dict, Hashable, Iterable, List, Sequence
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger("voicebot")
+
+lexical_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lexical")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Filler that carries no signal in spoken questions
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from how i in is it me my of on or "
+    "please should tell the to what when where which who why will with you your".split()
+)
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query matching any content word of the query."""
+    terms = [t for t in _TOKEN.findall(query.casefold()) if t not in _STOPWORDS]
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    limit: int,
+    key: Callable[[Document], Hashable] = lambda doc: doc.page_content,
+    rrf_k: int = 60,
+) -> List[Document]:
+    """Merge ranked lists: each document scores sum(1 / (rrf_k + rank)) over the lists it is in."""
+    scores: Dict[Hashable, float] = {}
+    docs: Dict[Hashable, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_key = key(doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(doc_key, doc)
+    return [docs[doc_key] for doc_key in sorted(scores, key=scores.get, reverse=True)[:limit]]
+
+
+class LexicalIndex:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "lexical.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._tables = set()
+
+    @staticmethod
+    def _table(kb_identifier: str) -> str:
+        return "fts_" + hashlib.sha256(kb_identifier.encode()).hexdigest()[:32]
+
+    def _ensure_table(self, kb_identifier: str) -> str:
+        table = self._table(kb_identifier)
+        if table not in self._tables:
+            self._db.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                "content, source UNINDEXED, content_hash UNINDEXED, metadata UNINDEXED, "
+                "tokenize = 'porter unicode61 remove_diacritics 2')"
+            )
+            self._tables.add(table)
+        return table
+
+    def _exists(self, kb_identifier: str) -> bool:
+        table = self._table(kb_identifier)
+        if table in self._tables:
+            return True
+        row = self._db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        if row:
+            self._tables.add(table)
+        return row is not None
+
+    def add_sync(self, docs: Iterable[Document]):
+        by_kb: Dict[str, List[Document]] = {}
+        for doc in docs:
+            by_kb.setdefault(doc.metadata["kb_identifier"], []).append(doc)
+        with self._lock:
+            for kb_identifier, kb_docs in by_kb.items():
+                table = self._ensure_table(kb_identifier)
+                rows = [
+                    (doc.metadata.get("source"), doc.metadata.get("content_hash")
+                     or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest())
+                    for doc in kb_docs
+                ]
+                # Re-indexing the same chunk replaces it
+                self._db.executemany(f"DELETE FROM {table} WHERE source = ? AND content_hash = ?", rows)
+                self._db.executemany(
+                    f"INSERT INTO {table} (content, source, content_hash, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (doc.page_content, source, content_hash, json.dumps(doc.metadata))
+                        for doc, (source, content_hash) in zip(kb_docs, rows)
+                    ],
+                )
+            self._db.commit()
+
+    def search_sync(self, kb_identifier: str, query: str, k: int) -> List[Document]:
+        expression = match_expression(query)
+        with self._lock:
+            if not expression or not self._exists(kb_identifier):
+                return []
+            table = self._table(kb_identifier)
+            rows = self._db.execute(
+                f"SELECT content, metadata FROM {table} WHERE {table} MATCH ? ORDER BY bm25({table}) LIMIT ?",
+                (expression, k),
+            ).fetchall()
+        return [Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows]
+
+    def delete_sync(self, kb_identifier: str, source: str, content_hashes: List[str] = None):
+        """Remove a document's chunks, or only those with the given hashes."""
+        with self._lock:
+            if not self._exists(kb_identifier):
+                return
+            table = self._table(kb_identifier)
+            if content_hashes is None:
+                self._db.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+            else:
+                self._db.executemany(
+                    f"DELETE FROM {table} WHERE source = ? AND content_hash = ?",
+                    [(source, content_hash) for content_hash in content_hashes],
+                )
+            self._db.commit()
+
+    async def add(self, docs: List[Document]):
+        await asyncio.get_running_loop().run_in_executor(lexical_executor, self.add_sync, docs)
+
+    async def search(self, kb_identifier: str, query: str, k: int) -> List[Document]:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                lexical_executor, self.search_sync, kb_identifier, query, k
+            )
+        except Exception as e:
+            logger.error(f"❌ Error searching lexical index: {e}")
+            return []
+
+    async def delete(self, kb_identifier: str, source: str, content_hashes: List[str] = None):
+        await asyncio.get_running_loop().run_in_executor(
+            lexical_executor, self.delete_sync, kb_identifier, source, content_hashes
+        )
@@ -1,8 +1,17 @@
 from langgraph.graph import StateGraph, END, START
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import SystemMessage, ToolMessage
 from typing import TypedDict
-from config import GEMINI_API_KEY
+from config import (
+    GEMINI_API_KEY,
+    LLM_MODEL,
+    LLM_BASE_URL,
+    LLM_TEMPERATURE,
+    GRAPH_CACHE_TTL,
+    GRAPH_CACHE_SIZE,
+    TOOL_RESULT_MAX_CHARS,
+)
 from rag_service import search_docs
+from map import LANGUAGE_CODE_TO_NAME
 from langchain_tavily import TavilySearch
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.memory import MemorySaver
@@ -15,6 +24,11 @@ from typing import List, Optional, Literal
 from langchain_core.tools import tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger("voicebot")
 
 tavily_search = TavilySearch(max_results=4)
 
@@ -48,6 +62,16 @@ def search_tool(query: str):
         return f"Error during Tavily search: {str(e)}"
 
 
+def build_system_prompt(rt_var: dict) -> str:
+    """System prompt for a signed-in user's persona call."""
+    lang = LANGUAGE_CODE_TO_NAME[rt_var["language"]]
+    if rt_var["session_summary"] != "":
+        prompt = f"Keep the responses short and concise. The responses should strictly be in {lang}.Dont use abbreviations or numerical content in your responses. previously the user has discussed: {rt_var['session_summary']}"
+    else:
+        prompt = f"Keep the responses short and concise. The responses should strictly be in {lang}.Dont use abbreviations or numerical content in your responses."
+    return rt_var["system_prompt"] + prompt
+
+
 # State definition
 class State(TypedDict):
     # add_messages is known as a reducer, where it does not modify the list but adds messages to it
@@ -56,7 +80,112 @@ class State(TypedDict):
     # both have same result no need to use BaseMessage
 
 
+_llm = None
+
+
+def get_llm() -> ChatOpenAI:
+    """Shared chat model client; it holds no per-session state and pools connections."""
+    global _llm
+    if _llm is None:
+        _llm = ChatOpenAI(
+            model=LLM_MODEL,
+            api_key=GEMINI_API_KEY,
+            base_url=LLM_BASE_URL,
+            temperature=LLM_TEMPERATURE,
+        )
+    return _llm
+
+
+# (kb_tool, mcp key, model settings) -> (expires_at, compiled graph)
+_graph_cache = {}
+_graph_builds = {}
+_graph_cache_generation = 0
+
+
+def _graph_cache_key(kb_tool: bool, mcp_config: dict):
+    mcp_key = None
+    if mcp_config:
+        token = mcp_config.get("bearerToken") or ""
+        mcp_key = (
+            mcp_config.get("id"),
+            mcp_config["name"],
+            mcp_config["url"],
+            hashlib.sha256(token.encode()).hexdigest(),
+        )
+    return (kb_tool, mcp_key, LLM_MODEL, LLM_BASE_URL, LLM_TEMPERATURE)
+
+
+def invalidate_graph_cache(server_id: str = None, url: str = None):
+    """Drop cached graphs built with the given MCP server, or every graph if none is given."""
+    global _graph_cache_generation
+    _graph_cache_generation += 1
+    for key in list(_graph_cache):
+        mcp_key = key[1]
+        if (server_id is None and url is None) or (
+            mcp_key
+            and (
+                (server_id is not None and mcp_key[0] == server_id)
+                or (url is not None and mcp_key[2] == url)
+            )
+        ):
+            del _graph_cache[key]
+
+
 async def create_graph(kb_tool: bool, mcp_config: dict):
+    """Return a compiled graph for this persona setup, reusing a cached one when fresh."""
+    key = _graph_cache_key(kb_tool, mcp_config)
+    entry = _graph_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    # Concurrent connections for the same persona share a single build
+    build = _graph_builds.get(key)
+    if build is None:
+        build = asyncio.create_task(_build_and_cache_graph(key, kb_tool, mcp_config))
+        _graph_builds[key] = build
+    return await asyncio.shield(build)
+
+
+async def _build_and_cache_graph(key, kb_tool: bool, mcp_config: dict):
+    generation = _graph_cache_generation
+    try:
+        started = time.perf_counter()
+        graph = await _build_graph(kb_tool, mcp_config)
+        logger.info(f"🧩 Built graph in {(time.perf_counter() - started) * 1000:.0f} ms")
+    finally:
+        _graph_builds.pop(key, None)
+
+    # Skip caching if an invalidation happened while we were building
+    if generation == _graph_cache_generation:
+        now = time.monotonic()
+        for stale in [k for k, (expires_at, _) in _graph_cache.items() if expires_at <= now]:
+            del _graph_cache[stale]
+        while len(_graph_cache) >= GRAPH_CACHE_SIZE:
+            del _graph_cache[next(iter(_graph_cache))]
+        _graph_cache[key] = (now + GRAPH_CACHE_TTL, graph)
+    return graph
+
+
+def cap_tool_messages(messages):
+    """
+    Cut oversized tool output (long web or MCP results) to
+    TOOL_RESULT_MAX_CHARS before it goes back to the LLM. Returns a new list.
+    """
+    capped = []
+    for message in messages:
+        if (
+            isinstance(message, ToolMessage)
+            and isinstance(message.content, str)
+            and len(message.content) > TOOL_RESULT_MAX_CHARS
+        ):
+            message = message.model_copy(
+                update={"content": message.content[:TOOL_RESULT_MAX_CHARS] + " [truncated]"}
+            )
+        capped.append(message)
+    return capped
+
+
+async def _build_graph(kb_tool: bool, mcp_config: dict):
     if mcp_config:
         server_config = {
             "url": mcp_config["url"],
@@ -73,12 +202,7 @@ async def create_graph(kb_tool: bool, mcp_config: dict):
         mcp_tools = await client.get_tools()
     else:
         mcp_tools = []
-    llm = ChatOpenAI(
-        model="gemini-2.0-flash",
-        api_key=GEMINI_API_KEY,
-        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",  # Any OpenAI-compatible endpoint
-        temperature=0.7,
-    )
+    llm = get_llm()
     if kb_tool:
         tools = [search_docs, search_tool]
     else:
@@ -87,7 +211,7 @@ async def create_graph(kb_tool: bool, mcp_config: dict):
     llm_with_tools = llm.bind_tools(tools)
 
     async def llm_node(state: State):
-        messages = state["messages"]
+        messages = cap_tool_messages(state["messages"])
         response = await llm_with_tools.ainvoke(messages)
         return {"messages": [response]}
 
@@ -102,19 +226,8 @@ async def create_graph(kb_tool: bool, mcp_config: dict):
     return builder.compile()
 
 
-# Build basic graph (no tools, no memory)
-def create_basic_graph():
-    llm = ChatOpenAI(
-        model="gemini-2.0-flash",
-        api_key=GEMINI_API_KEY,
-        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",  # Any OpenAI-compatible endpoint
-        temperature=0.7,
-    )
-
-    async def llm_basic_node(state: State):
-        messages = state["messages"]
-        system_prompt = SystemMessage(
-            content="""You are a helpful and friendly voice AI assistant. Your responses should be:
+BASIC_SYSTEM_PROMPT = SystemMessage(
+    content="""You are a helpful and friendly voice AI assistant. Your responses should be:
 
     - Conversational and natural, as if speaking to a friend
     - Concise but informative - aim for 1-3 sentences unless more detail is specifically requested
@@ -131,13 +244,31 @@ def create_basic_graph():
 
     Remember that users are interacting with you through voice, so structure your responses to be easily understood when heard rather than read.
     Dont use abbreviations or numerical content in your responses."""
-        )
+)
+
+
+# Build basic graph (no tools, no memory)
+def build_basic_graph(llm):
+    async def llm_basic_node(state: State):
+        messages = state["messages"]
         if not any(isinstance(m, SystemMessage) for m in messages):
-            messages.insert(0, system_prompt)
-        return {"messages": [llm.invoke(messages)]}
+            messages = [BASIC_SYSTEM_PROMPT] + list(messages)
+        # ainvoke keeps the event loop free and streams tokens under astream
+        return {"messages": [await llm.ainvoke(messages)]}
 
     builder = StateGraph(State)
     builder.add_node("llm_basic", llm_basic_node)
     builder.set_entry_point("llm_basic")
     builder.add_edge("llm_basic", END)
     return builder.compile()  # No checkpointing
+
+
+_basic_graph = None
+
+
+def create_basic_graph():
+    """Return the anonymous graph, compiled once and shared by every session."""
+    global _basic_graph
+    if _basic_graph is None:
+        _basic_graph = build_basic_graph(get_llm())
+    return _basic_graph
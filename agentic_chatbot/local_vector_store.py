@@ -0,0 +1,400 @@
+"""
+In-process vector store, a drop-in for SupabaseVectorStore.
+
+Each knowledge base gets a directory under the store root holding its
+vectors as a memory-mapped float32 array (one slot per chunk, slots of
+deleted chunks are reused) and, once it is large enough, an IVF index:
+spherical k-means centroids plus the list each slot belongs to. Chunk text
+and metadata live in one sqlite database next to them.
+
+Small knowledge bases are searched exactly with one matrix-vector product;
+past LOCAL_IVF_MIN_ROWS chunks only the LOCAL_IVF_NPROBE lists closest to
+the query are scored. Centroids are trained once and retrained when the
+knowledge base has grown fourfold, new chunks are assigned as they arrive.
+
+Embedding is injected (embed_documents / embed_query coroutines), so the
+store runs with no model and no external services.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("voicebot")
+
+# Searches and writes run here so scoring never blocks the event loop
+store_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vector-store")
+
+
+def _train_spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int = 10) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty lists with random points rather than losing them
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class _KnowledgeBaseIndex:
+    """Vectors, liveness and IVF lists of one knowledge base."""
+
+    def __init__(self, directory: str, dim: int, capacity: int):
+        self.directory = directory
+        self.dim = dim
+        self.lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        # Files on disk may be larger than the live slots suggest (rows freed at the end)
+        vectors_path = os.path.join(directory, "vectors.f32")
+        if os.path.exists(vectors_path):
+            capacity = max(capacity, os.path.getsize(vectors_path) // (4 * dim))
+        self.vectors = self._open(os.path.join(directory, "vectors.f32"), np.float32, (capacity, dim))
+        self.assign = self._open(os.path.join(directory, "ivf_assign.i32"), np.int32, (capacity,), fill=-1)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.high_water = 0
+        centroids_path = os.path.join(directory, "ivf_centroids.npy")
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        self.trained_rows = 0
+        self._lists: Optional[Dict[int, np.ndarray]] = None
+
+    @staticmethod
+    def _open(path, dtype, shape, fill=0):
+        size = np.dtype(dtype).itemsize * int(np.prod(shape))
+        if not os.path.exists(path):
+            array = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+            if fill:
+                array[:] = fill
+            return array
+        # Never recreate an existing file; extend it in place if it is short
+        existing = os.path.getsize(path)
+        if existing < size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        array = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+        if fill and existing < size:
+            array.reshape(-1)[existing // np.dtype(dtype).itemsize:] = fill
+        return array
+
+    @property
+    def capacity(self) -> int:
+        return len(self.alive)
+
+    def grow(self, needed: int):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        for name, attr, fill in (("vectors.f32", "vectors", 0), ("ivf_assign.i32", "assign", -1)):
+            old = getattr(self, attr)
+            path = os.path.join(self.directory, name)
+            tmp = np.memmap(path + ".tmp", dtype=old.dtype, mode="w+", shape=(capacity,) + old.shape[1:])
+            if fill:
+                tmp[:] = fill
+            tmp[:len(old)] = old
+            tmp.flush()
+            del tmp
+            os.replace(path + ".tmp", path)
+            setattr(self, attr, np.memmap(path, dtype=old.dtype, mode="r+", shape=(capacity,) + old.shape[1:]))
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+
+    def allocate(self, count: int) -> np.ndarray:
+        free = np.flatnonzero(~self.alive[:self.high_water])[:count]
+        fresh = np.arange(self.high_water, self.high_water + count - len(free))
+        if len(fresh):
+            self.grow(self.high_water + len(fresh))
+            self.high_water += len(fresh)
+        return np.concatenate([free, fresh]).astype(np.int64)
+
+    def write(self, slots: np.ndarray, vectors: np.ndarray):
+        self.vectors[slots] = vectors
+        self.alive[slots] = True
+        if self.centroids is not None:
+            self.assign[slots] = np.argmax(vectors @ self.centroids.T, axis=1)
+            self._lists = None
+
+    def remove(self, slots: np.ndarray):
+        self.alive[slots] = False
+        self.assign[slots] = -1
+        self._lists = None
+
+    def maybe_train(self, min_rows: int):
+        alive = np.flatnonzero(self.alive[:self.high_water])
+        if len(alive) < min_rows:
+            return
+        if self.centroids is not None and len(alive) < 4 * max(self.trained_rows, min_rows // 4):
+            return
+        nlist = int(np.clip(2 * np.sqrt(len(alive)), 16, 1024))
+        rng = np.random.default_rng(0)
+        sample = self.vectors[rng.choice(alive, min(len(alive), nlist * 64), replace=False)]
+        self.centroids = _train_spherical_kmeans(np.asarray(sample), nlist)
+        for start in range(0, len(alive), 8192):
+            part = alive[start:start + 8192]
+            self.assign[part] = np.argmax(self.vectors[part] @ self.centroids.T, axis=1)
+        path = os.path.join(self.directory, "ivf_centroids.npy")
+        np.save(path + ".tmp.npy", self.centroids)
+        os.replace(path + ".tmp.npy", path)
+        self.trained_rows = len(alive)
+        self._lists = None
+        logger.info(f"🧭 Trained IVF index with {nlist} lists on {len(alive)} vectors")
+
+    def search(self, query: np.ndarray, k: int, nprobe: int):
+        if self.centroids is not None:
+            if self._lists is None:
+                slots = np.flatnonzero(self.assign[:self.high_water] >= 0)
+                order = np.argsort(self.assign[slots], kind="stable")
+                slots = slots[order]
+                bounds = np.searchsorted(self.assign[slots], np.arange(len(self.centroids) + 1))
+                self._lists = {c: slots[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))}
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.concatenate([self._lists[c] for c in probe])
+            scores = self.vectors[candidates] @ query
+        else:
+            # Score the contiguous block, then drop deleted slots, instead of gathering rows
+            scores = self.vectors[:self.high_water] @ query
+            candidates = np.flatnonzero(self.alive[:self.high_water])
+            scores = scores[candidates]
+        if not len(candidates):
+            return [], []
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top].tolist(), scores[top].tolist()
+
+    def close(self):
+        self.vectors.flush()
+        self.assign.flush()
+
+
+class LocalVectorStore:
+    def __init__(
+        self,
+        directory: str,
+        embed_documents: Callable[..., Awaitable[List[List[float]]]],
+        embed_query: Callable[..., Awaitable[List[float]]],
+        default_dim: int,
+        ivf_min_rows: int = 20000,
+        nprobe: int = 8,
+        initial_capacity: int = 1024,
+    ):
+        self.directory = directory
+        self.embed_documents = embed_documents
+        self.embed_query = embed_query
+        self.default_dim = default_dim
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.initial_capacity = initial_capacity
+        os.makedirs(directory, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "chunks.db"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS knowledge_bases (kb TEXT PRIMARY KEY, dim INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kb TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                source TEXT,
+                content_hash TEXT,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_kb_slot ON chunks (kb, slot);
+            CREATE INDEX IF NOT EXISTS chunks_kb_source ON chunks (kb, source);
+            CREATE INDEX IF NOT EXISTS chunks_kb_hash ON chunks (kb, content_hash);
+        """)
+        self._indexes: Dict[str, _KnowledgeBaseIndex] = {}
+        self._indexes_lock = threading.Lock()
+
+    # -- sync internals, run on store_executor --
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _kb_dir(self, kb_identifier: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(kb_identifier.encode()).hexdigest()[:32])
+
+    def _index(self, kb_identifier: str, dim: Optional[int] = None) -> Optional[_KnowledgeBaseIndex]:
+        """Open (or with dim, create) the index of a knowledge base."""
+        with self._indexes_lock:
+            index = self._indexes.get(kb_identifier)
+            if index is not None:
+                return index
+            row = self._query("SELECT dim FROM knowledge_bases WHERE kb = ?", (kb_identifier,))
+            if row:
+                dim = row[0][0]
+            elif dim is None:
+                return None
+            else:
+                with self._db_lock:
+                    self._db.execute("INSERT INTO knowledge_bases VALUES (?, ?)", (kb_identifier, dim))
+                    self._db.commit()
+            slots = [s for (s,) in self._query("SELECT slot FROM chunks WHERE kb = ?", (kb_identifier,))]
+            capacity = self.initial_capacity
+            while capacity <= max(slots, default=0):
+                capacity *= 2
+            index = _KnowledgeBaseIndex(self._kb_dir(kb_identifier), dim, capacity)
+            if slots:
+                index.alive[slots] = True
+                index.high_water = max(slots) + 1
+                index.trained_rows = len(slots) if index.centroids is not None else 0
+            self._indexes[kb_identifier] = index
+            return index
+
+    def _add(self, docs: List[Document], embeddings: List[List[float]]):
+        by_kb: Dict[str, list] = {}
+        for doc, embedding in zip(docs, embeddings):
+            if isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            by_kb.setdefault(doc.metadata["kb_identifier"], []).append((doc, embedding))
+        for kb_identifier, items in by_kb.items():
+            vectors = np.asarray([embedding for _, embedding in items], dtype=np.float32)
+            index = self._index(kb_identifier, dim=vectors.shape[1])
+            if vectors.shape[1] != index.dim:
+                raise ValueError(f"Knowledge base {kb_identifier} stores {index.dim}-d vectors, got {vectors.shape[1]}")
+            with index.lock:
+                slots = index.allocate(len(items))
+                index.write(slots, vectors)
+                with self._db_lock:
+                    self._db.executemany(
+                        "INSERT INTO chunks (kb, slot, source, content_hash, content, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (kb_identifier, int(slot), doc.metadata.get("source"), doc.metadata.get("content_hash"),
+                             doc.page_content, json.dumps(doc.metadata))
+                            for slot, (doc, _) in zip(slots, items)
+                        ],
+                    )
+                    self._db.commit()
+                index.maybe_train(self.ivf_min_rows)
+
+    def _search(self, query_by_dim: Dict[int, np.ndarray], kb_identifiers: List[str], k: int) -> List[Document]:
+        hits = []
+        for kb_identifier in kb_identifiers:
+            index = self._index(kb_identifier)
+            if index is None:
+                continue
+            with index.lock:
+                slots, scores = index.search(query_by_dim[index.dim], k, self.nprobe)
+            hits.extend((score, kb_identifier, slot) for slot, score in zip(slots, scores))
+        hits = sorted(hits, reverse=True)[:k]
+        docs = []
+        for score, kb_identifier, slot in hits:
+            row = self._query("SELECT content, metadata FROM chunks WHERE kb = ? AND slot = ?", (kb_identifier, slot))
+            if row:
+                docs.append(Document(page_content=row[0][0], metadata=json.loads(row[0][1])))
+        return docs
+
+    def _delete(self, where: str, params) -> int:
+        rows = self._query(f"SELECT id, kb, slot FROM chunks WHERE {where}", params)
+        by_kb: Dict[str, list] = {}
+        for _, kb_identifier, slot in rows:
+            by_kb.setdefault(kb_identifier, []).append(slot)
+        for kb_identifier, slots in by_kb.items():
+            index = self._index(kb_identifier)
+            with index.lock:
+                index.remove(np.asarray(slots))
+                with self._db_lock:
+                    self._db.executemany("DELETE FROM chunks WHERE id = ?", [(row[0],) for row in rows if row[1] == kb_identifier])
+                    self._db.commit()
+                if not index.alive.any():
+                    self._drop_kb(kb_identifier)
+        return len(rows)
+
+    def _drop_kb(self, kb_identifier: str):
+        # An empty knowledge base can start over, possibly with another embedding size
+        with self._indexes_lock:
+            index = self._indexes.pop(kb_identifier, None)
+            with self._db_lock:
+                self._db.execute("DELETE FROM knowledge_bases WHERE kb = ?", (kb_identifier,))
+                self._db.commit()
+        if index is not None:
+            del index
+        shutil.rmtree(self._kb_dir(kb_identifier), ignore_errors=True)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(store_executor, fn, *args)
+
+    # -- SupabaseVectorStore interface --
+
+    async def add_documents(self, docs: List[Document]):
+        kb_identifier = docs[0].metadata.get("kb_identifier") if docs else None
+        dim = (await self.get_kb_embedding_dim(kb_identifier) if kb_identifier else None) or self.default_dim
+        for doc in docs:
+            doc.metadata["embedding_dim"] = dim
+        embeddings = await self.embed_documents([doc.page_content for doc in docs], dim=dim)
+        await self.add_embedded_documents(docs, embeddings)
+
+    async def add_embedded_documents(self, docs: List[Document], embeddings: List[List[float]]):
+        await self._run(self._add, docs, embeddings)
+        logger.info(f"✅ Added {len(docs)} documents to local vector store")
+
+    async def similarity_search(self, query: str, k: int = 4, filter_conditions: dict = None):
+        try:
+            kb_dims = dict(await self._run(self._query, "SELECT kb, dim FROM knowledge_bases"))
+            kb_identifier = (filter_conditions or {}).get("kb_identifier")
+            kb_identifiers = [kb_identifier] if kb_identifier else list(kb_dims)
+            query_by_dim = {}
+            for dim in {kb_dims[kb] for kb in kb_identifiers if kb in kb_dims}:
+                query_by_dim[dim] = np.asarray(await self.embed_query(query, dim=dim), dtype=np.float32)
+            return await self._run(self._search, query_by_dim, kb_identifiers, k)
+        except Exception as e:
+            logger.error(f"❌ Error searching local vector store: {e}")
+            return []
+
+    async def get_kb_embedding_dim(self, kb_identifier: str) -> Optional[int]:
+        rows = await self._run(self._query, "SELECT dim FROM knowledge_bases WHERE kb = ?", (kb_identifier,))
+        return rows[0][0] if rows else None
+
+    def forget_kb_embedding_dim(self, kb_identifier: str):
+        pass  # The knowledge_bases table is authoritative
+
+    async def get_chunk_index(self, kb_identifier: str) -> List[dict]:
+        rows = await self._run(
+            self._query, "SELECT id, source, content_hash FROM chunks WHERE kb = ?", (kb_identifier,)
+        )
+        return [{"id": id, "source": source, "content_hash": content_hash} for id, source, content_hash in rows]
+
+    async def get_embeddings_by_hash(self, kb_identifier: str, content_hashes: List[str]) -> dict:
+        def lookup():
+            index = self._index(kb_identifier)
+            if index is None:
+                return {}
+            found = {}
+            for content_hash in content_hashes:
+                row = self._query(
+                    "SELECT slot FROM chunks WHERE kb = ? AND content_hash = ? LIMIT 1", (kb_identifier, content_hash)
+                )
+                if row:
+                    found[content_hash] = index.vectors[row[0][0]].tolist()
+            return found
+        return await self._run(lookup)
+
+    async def delete_chunks(self, ids: List[int]):
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            await self._run(self._delete, f"id IN ({','.join('?' * len(part))})", part)
+
+    async def delete_document(self, kb_identifier: str, source: str) -> int:
+        return await self._run(self._delete, "kb = ? AND source = ?", (kb_identifier, source))
+
+    def close(self):
+        with self._indexes_lock:
+            for index in self._indexes.values():
+                index.close()
+        with self._db_lock:
+            self._db.close()
@@ -7,9 +7,22 @@ Please run: python app.py or use uvicorn app:app
 The modular structure:
 - config.py: Configuration and constants
 - audio_services.py: ASR and TTS functionality 
+- embedding_service.py: Embedding model and off-loop batched embedding
+- embedding_cache.py: Persistent memory-mapped embedding cache
+- onnx_embeddings.py: ONNX Runtime (int8) embedding backend
 - rag_service.py: Vector store and document search
+- local_vector_store.py: In-process memory-mapped vector store (exact / IVF)
+- lexical_index.py: Per-knowledge-base BM25 index and rank fusion
+- reranker.py: Optional cross-encoder rerank with a time budget
+- kb_catalog.py: Knowledge base / document catalog behind the listing endpoints
 - llm_service.py: LangGraph and LLM handling
+- conversation_context.py: Token-budgeted turn window with a rolling summary
 - document_service.py: PDF processing and document upload
+- pdf_extraction.py: Parallel page-range PDF text extraction
+- document_processing.py: Streaming chunker for ingestion
+- bulk_insert.py: Bounded, retried inserts into document_vectors
+- ingestion_jobs.py: Background upload queue and job status
+- session_summary_queue.py: Durable, rate-limited end-of-session summary queue
 - websocket_handler.py: WebSocket connection handling
 - app.py: FastAPI application and routes
 """
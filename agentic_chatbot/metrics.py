@@ -0,0 +1,158 @@
+from langchain_core.callbacks import AsyncCallbackHandler
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+import bisect
+import threading
+import time
+
+# Seconds; tuned for voice turns (tens of ms for sends up to tens of seconds for long replies)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Minimal Prometheus-style histogram with one optional label."""
+
+    def __init__(self, name: str, help: str, label: str = None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: str = ""):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_value] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        for label_value, (counts, total) in sorted(snapshot.items()):
+            labels = f'{self.label}="{label_value}",' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {cumulative}')
+            suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+turn_stage_seconds = Histogram(
+    "voicebot_turn_stage_seconds", "Duration of each stage of a voice turn.", label="stage"
+)
+tool_seconds = Histogram(
+    "voicebot_tool_seconds", "Duration of tool calls made by the LLM.", label="tool"
+)
+retrieval_stage_seconds = Histogram(
+    "voicebot_retrieval_stage_seconds", "Duration of each knowledge base retrieval stage.", label="stage"
+)
+# Characters search_docs adds to the prompt, before and after reranking
+search_result_chars = Histogram(
+    "voicebot_search_result_chars", "Size of search_docs results in characters.", label="stage",
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000),
+)
+# Estimated prompt size per turn; levels off at the context budget in long calls
+prompt_tokens = Histogram(
+    "voicebot_prompt_tokens", "Estimated tokens sent to the LLM per turn.",
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000),
+)
+_histograms = [turn_stage_seconds, tool_seconds, retrieval_stage_seconds, search_result_chars, prompt_tokens]
+# name -> callable returning {metric suffix: value}, e.g. cache stats
+_gauges: Dict[str, Callable[[], dict]] = {}
+
+
+def register_gauges(prefix: str, collect: Callable[[], dict]):
+    """Expose numeric values returned by collect() as gauges named voicebot_<prefix>_<key>."""
+    _gauges[prefix] = collect
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in _histograms:
+        lines.extend(histogram.render())
+    for prefix, collect in _gauges.items():
+        for key, value in collect().items():
+            if isinstance(value, (int, float)):
+                name = f"voicebot_{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class TurnTimer:
+    """
+    Collects the timing spans of one voice turn.
+
+    Spans are kept in seconds and only pushed to the histograms in finish(),
+    so instrumenting the hot path is just a perf_counter() call and a dict
+    update. Repeated spans (sends, a tool called twice) are summed.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def since(self, stage: str, started: float):
+        self.record(stage, time.perf_counter() - started)
+
+    def once(self, stage: str, started: float):
+        """Record a milestone (first token, first byte) only the first time."""
+        if stage not in self.spans:
+            self.since(stage, started)
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.since(stage, started)
+
+    def finish(self):
+        self.since("total", self.started)
+        for stage, seconds in self.spans.items():
+            if stage.startswith("tool:"):
+                tool_seconds.observe(seconds, stage[len("tool:"):])
+            else:
+                turn_stage_seconds.observe(seconds, stage)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.spans.items()}
+
+
+class ToolTimingHandler(AsyncCallbackHandler):
+    """Records each tool call (search_docs, search_tool, MCP tools) on the turn timer."""
+
+    def __init__(self, timer: TurnTimer):
+        self.timer = timer
+        self._started = {}
+
+    async def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._started[run_id] = (name, time.perf_counter())
+
+    async def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    async def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            name, started_at = started
+            self.timer.since(f"tool:{name}", started_at)
@@ -0,0 +1,68 @@
+"""
+ONNX Runtime embedding backend.
+
+Runs the exported nomic-embed-text-v1.5 graph (the int8 model_quantized.onnx
+by default) on CPU with the same mean pooling and L2 normalization as the
+sentence-transformers pipeline, so vectors stay interchangeable with the
+PyTorch backend. Needs onnxruntime, which is not installed by default:
+pip install onnxruntime.
+"""
+from langchain_core.embeddings import Embeddings
+from typing import List
+import os
+
+import numpy as np
+
+
+def resolve_model_file(model: str, filename: str) -> str:
+    """Path of filename inside a local checkpoint directory, or fetched from the Hub."""
+    if os.path.isdir(model):
+        return os.path.join(model, filename)
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(model, filename)
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model: str, onnx_file: str, max_length: int = 8192, threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx needs onnxruntime: pip install onnxruntime") from e
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.max_length = max_length
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            resolve_model_file(model, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._input_names}
+        hidden = self.session.run(None, inputs)[0]  # (batch, tokens, dim)
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Similar lengths in one run keep padding (wasted compute) down
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings: List[List[float]] = [None] * len(texts)
+        for start in range(0, len(order), 32):
+            part = order[start:start + 32]
+            for i, embedding in zip(part, self._embed([texts[i] for i in part])):
+                embeddings[i] = embedding
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
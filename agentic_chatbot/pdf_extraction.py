@@ -0,0 +1,79 @@
+"""
+Parallel PDF text extraction.
+
+pdfplumber is pure Python and slow, so a PDF is split into page ranges that
+are extracted concurrently in a process pool. Pages are yielded back in
+order as soon as their range is done, with only a bounded window of ranges
+in flight, so callers can stream them into the chunker.
+
+This module is imported by the worker processes; keep it free of the
+embedding model and the Supabase client.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import AsyncIterator, Callable, List, Optional
+import asyncio
+import multiprocessing
+import pdfplumber
+from config import INGEST_PROCESS_WORKERS, PDF_PAGES_PER_TASK
+
+# "spawn" avoids forking a process that already runs threads
+process_pool = ProcessPoolExecutor(
+    max_workers=INGEST_PROCESS_WORKERS,
+    mp_context=multiprocessing.get_context("spawn"),
+)
+
+
+def count_pdf_pages(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_page_range(path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) (0-based)."""
+    with pdfplumber.open(path, pages=range(start + 1, end + 1)) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def extract_pdf_pages(path: str) -> List[str]:
+    """Serial extraction of every page, for small files and benchmarks."""
+    with pdfplumber.open(path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+async def iter_pdf_pages(
+    path: str,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    executor=None,
+    on_page_count: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[str]:
+    """Yield page texts in page order while ranges are extracted in parallel."""
+    executor = executor or process_pool
+    loop = asyncio.get_running_loop()
+    page_count = await loop.run_in_executor(executor, count_pdf_pages, path)
+    if on_page_count:
+        on_page_count(page_count)
+    ranges = iter(
+        [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    )
+
+    def submit(page_range):
+        return loop.run_in_executor(executor, extract_pdf_page_range, path, *page_range)
+
+    # Two ranges per process keeps every core busy without buffering the whole file
+    in_flight = deque()
+    for page_range in ranges:
+        in_flight.append(submit(page_range))
+        if len(in_flight) >= INGEST_PROCESS_WORKERS * 2:
+            break
+    try:
+        while in_flight:
+            pages = await in_flight.popleft()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(submit(next_range))
+            for page in pages:
+                yield page
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -1,57 +1,161 @@
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.tools import tool
-from config import EMBEDDING_MODEL_NAME
 from langchain_core.runnables import RunnableConfig
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from typing import List, Set
+from typing import Dict, List, Optional
 from custom_supabase import get_supabase
+from embedding_service import embedding_model, embed_documents, embed_query
+from bulk_insert import bulk_insert_rows, encode_vector
+from local_vector_store import LocalVectorStore
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from kb_catalog import remove_document
+from postgrest.types import CountMethod, ReturnMethod
+from config import (
+    EMBEDDING_DIM,
+    EMBEDDING_SIZE,
+    VECTOR_STORE_BACKEND,
+    LOCAL_VECTOR_STORE_DIR,
+    LOCAL_IVF_MIN_ROWS,
+    LOCAL_IVF_NPROBE,
+    HYBRID_SEARCH,
+    LEXICAL_INDEX_DIR,
+    SEARCH_TOP_K,
+    SEARCH_CANDIDATES,
+    RRF_K,
+    RERANK_ENABLED,
+    RERANK_CANDIDATES,
+    SPECULATIVE_MIN_SIMILARITY,
+)
+from metrics import retrieval_stage_seconds, search_result_chars, register_gauges
+from embedding_service import QueryEmbeddingCache
+import asyncio
 import logging
+import time
+import uuid
 logger = logging.getLogger("voicebot")
-# Setup embedding and vector store
-embedding_model = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_MODEL_NAME,
-    model_kwargs={
-        "device": "cpu",
-        "trust_remote_code": True
-    },
-    encode_kwargs={
-        "normalize_embeddings": True
-    }
-)
+
+if RERANK_ENABLED:
+    from reranker import rerank
 
 class SupabaseVectorStore:
     def __init__(self):
         self.embedding_model = embedding_model
+        # kb_identifier -> embedding size its vectors were stored with
+        self._kb_dims: Dict[str, int] = {}
 
     async def add_documents(self, docs):
         """Add documents to Supabase vector store"""
+        kb_identifier = docs[0].metadata.get("kb_identifier") if docs else None
+        dim = await self.get_kb_embedding_dim(kb_identifier) if kb_identifier else None
+        dim = dim or EMBEDDING_DIM
+        for doc in docs:
+            doc.metadata["embedding_dim"] = dim
+        # Batched embedding on the embedding executor keeps the event loop free
+        embeddings = await embed_documents([doc.page_content for doc in docs], dim=dim)
+        await self.add_embedded_documents(docs, embeddings)
+
+    async def get_kb_embedding_dim(self, kb_identifier: str) -> Optional[int]:
+        """Embedding size used by a knowledge base, or None if it has no vectors yet"""
+        dim = self._kb_dims.get(kb_identifier)
+        if dim is not None:
+            return dim
+        supabase = await get_supabase()
+        response = await supabase.table("document_vectors") \
+            .select("embedding_dim:metadata->>embedding_dim") \
+            .eq("metadata->>kb_identifier", kb_identifier) \
+            .limit(1) \
+            .execute()
+        if not response.data:
+            return None
+        # Rows written before sizes were recorded hold full-size vectors
+        dim = int(response.data[0]["embedding_dim"] or EMBEDDING_SIZE)
+        self._kb_dims[kb_identifier] = dim
+        return dim
+
+    def forget_kb_embedding_dim(self, kb_identifier: str):
+        """Drop the cached size, e.g. after the knowledge base's documents are deleted"""
+        self._kb_dims.pop(kb_identifier, None)
+
+    async def add_embedded_documents(self, docs, embeddings):
+        """Insert documents whose embeddings have already been computed"""
         try:
             supabase = await get_supabase()
 
             documents_to_insert = []
-            for doc in docs:
-                embedding = self.embedding_model.embed_query(doc.page_content)
-
+            for doc, embedding in zip(docs, embeddings):
+                # Retries need a stable id to clear partially committed batches
+                doc.metadata.setdefault("chunk_id", str(uuid.uuid4()))
                 documents_to_insert.append({
                     "content": doc.page_content,
                     "metadata": doc.metadata,
-                    "embedding": embedding
+                    # Embeddings copied from existing rows are already pgvector literals
+                    "embedding": embedding if isinstance(embedding, str) else encode_vector(embedding)
                 })
 
-            # Batch insert for better performance
-            await supabase.table("document_vectors").insert(documents_to_insert).execute()
-            logger.info(f"✅ Added {len(docs)} documents to Supabase vector store")
+            # Bounded batches, a few in flight, each retried on its own
+            stats = await bulk_insert_rows(supabase, documents_to_insert)
+            logger.info(
+                f"✅ Added {len(docs)} documents to Supabase vector store "
+                f"({stats['batches']} batches, {stats['rows_per_second']:.0f} rows/s)"
+            )
 
         except Exception as e:
             logger.error(f"❌ Error adding documents to vector store: {e}")
             raise e
 
+    async def get_chunk_index(self, kb_identifier: str) -> List[dict]:
+        """id, source and content_hash of every chunk in a knowledge base (no content or vectors)"""
+        supabase = await get_supabase()
+        rows, page_size = [], 1000
+        while True:
+            response = await supabase.table("document_vectors") \
+                .select("id, source:metadata->>source, content_hash:metadata->>content_hash") \
+                .eq("metadata->>kb_identifier", kb_identifier) \
+                .order("id") \
+                .range(len(rows), len(rows) + page_size - 1) \
+                .execute()
+            rows.extend(response.data)
+            if len(response.data) < page_size:
+                return rows
+
+    async def get_embeddings_by_hash(self, kb_identifier: str, content_hashes: List[str]) -> dict:
+        """content_hash -> stored embedding for chunks already embedded in the knowledge base"""
+        if not content_hashes:
+            return {}
+        supabase = await get_supabase()
+        response = await supabase.table("document_vectors") \
+            .select("content_hash:metadata->>content_hash, embedding") \
+            .eq("metadata->>kb_identifier", kb_identifier) \
+            .in_("metadata->>content_hash", list(content_hashes)) \
+            .execute()
+        return {row["content_hash"]: row["embedding"] for row in response.data}
+
+    async def delete_chunks(self, ids: List[str]):
+        supabase = await get_supabase()
+        for start in range(0, len(ids), 200):
+            await supabase.table("document_vectors") \
+                .delete() \
+                .in_("id", ids[start:start + 200]) \
+                .execute()
+
+    async def delete_document(self, kb_identifier: str, source: str) -> int:
+        """Delete every chunk of a document; returns how many were removed"""
+        supabase = await get_supabase()
+        response = await supabase.table("document_vectors") \
+            .delete(count=CountMethod.exact, returning=ReturnMethod.minimal) \
+            .eq("metadata->>kb_identifier", kb_identifier) \
+            .eq("metadata->>source", source) \
+            .execute()
+        return response.count or 0
+
     async def similarity_search(self, query: str, k: int = 4, filter_conditions: dict = None):
         """Search for similar documents with optional filtering"""
         try:
             supabase = await get_supabase()
 
-            query_embedding = self.embedding_model.embed_query(query)
+            # The query vector must have the size the knowledge base was stored with
+            kb_identifier = (filter_conditions or {}).get('kb_identifier')
+            dim = await self.get_kb_embedding_dim(kb_identifier) if kb_identifier else None
+            query_embedding = await embed_query(query, dim=dim or EMBEDDING_DIM)
 
             rpc_params = {
                 'query_embedding': query_embedding,
@@ -77,84 +181,33 @@ class SupabaseVectorStore:
             logger.error(f"❌ Error searching vector store: {e}")
             return []
 
-vectorstore = SupabaseVectorStore()
-
-async def get_user_knowledge_bases(userid: str) -> List[str]:
-    try:
-        supabase = await get_supabase()
-
-        # Query documents for this user and extract unique knowledge bases
-        response = await supabase.table("document_vectors") \
-            .select("metadata") \
-            .like("metadata->>kb_identifier", f"{userid}_%") \
-            .execute()
-
-        knowledge_bases: Set[str] = set()
-        userid_prefix = f"{userid}_"
-
-        for row in response.data:
-            metadata = row['metadata']
-            if metadata and 'kb_identifier' in metadata:
-                kb_identifier = metadata['kb_identifier']
-                if kb_identifier and kb_identifier.startswith(userid_prefix):
-                    kb_name = kb_identifier[len(userid_prefix):]
-                    if kb_name:
-                        knowledge_bases.add(kb_name)
-
-        return sorted(list(knowledge_bases))
-
-    except Exception as e:
-        print(f"❌ Error fetching knowledge bases for user {userid}: {str(e)}")
-        return []
-
-async def get_kb_documents(userid: str, knowledge_base: str) -> List[dict]:
-    """Get all documents in a specific knowledge base for a user"""
-    try:
-        supabase = await get_supabase()
-        kb_identifier = f"{userid}_{knowledge_base}"
-
-        # Query documents for this specific knowledge base
-        response = await supabase.table("document_vectors") \
-            .select("id, content, metadata") \
-            .eq("metadata->>kb_identifier", kb_identifier) \
-            .execute()
+if VECTOR_STORE_BACKEND == "local":
+    vectorstore = LocalVectorStore(
+        LOCAL_VECTOR_STORE_DIR,
+        embed_documents=embed_documents,
+        embed_query=embed_query,
+        default_dim=EMBEDDING_DIM,
+        ivf_min_rows=LOCAL_IVF_MIN_ROWS,
+        nprobe=LOCAL_IVF_NPROBE,
+    )
+else:
+    vectorstore = SupabaseVectorStore()
 
-        # Group by filename and get unique documents
-        documents_dict = {}
-        for row in response.data:
-            metadata = row['metadata']
-            if metadata and 'source' in metadata:
-                filename = metadata['source']
-                if filename not in documents_dict:
-                    documents_dict[filename] = {
-                        'id': str(row['id']),
-                        'filename': filename,
-                        'knowledge_base': knowledge_base,
-                        'upload_date': metadata.get('upload_date', 'Unknown')
-                    }
-
-        return list(documents_dict.values())
-
-    except Exception as e:
-        logger.error(f"❌ Error fetching documents for KB {knowledge_base}: {str(e)}")
-        return []
+lexical_index = LexicalIndex(LEXICAL_INDEX_DIR) if HYBRID_SEARCH else None
 
 async def delete_document_from_kb(userid: str, knowledge_base: str, filename: str) -> bool:
     """Delete all chunks of a specific document from a knowledge base"""
     try:
-        supabase = await get_supabase()
         kb_identifier = f"{userid}_{knowledge_base}"
 
         # Delete all chunks of the document
-        response = await supabase.table("document_vectors") \
-            .delete() \
-            .eq("metadata->>kb_identifier", kb_identifier) \
-            .eq("metadata->>source", filename) \
-            .execute()
+        deleted_count = await vectorstore.delete_document(kb_identifier, filename)
+        vectorstore.forget_kb_embedding_dim(kb_identifier)
+        if lexical_index is not None:
+            await lexical_index.delete(kb_identifier, filename)
+        await remove_document(userid, knowledge_base, filename)
 
-        # Check if any rows were deleted
-        if hasattr(response, 'data') and response.data is not None:
-            deleted_count = len(response.data) if isinstance(response.data, list) else 1
+        if deleted_count:
             logger.info(f"✅ Deleted {deleted_count} chunks for document '{filename}' from KB '{knowledge_base}'")
             return True
         else:
@@ -165,6 +218,78 @@ async def delete_document_from_kb(userid: str, knowledge_base: str, filename: st
         logger.error(f"❌ Error deleting document '{filename}' from KB '{knowledge_base}': {str(e)}")
         return False
 
+async def retrieve(query: str, kb_identifier: str, k: int = SEARCH_TOP_K) -> list:
+    """
+    Top k chunks of a knowledge base. Vector and BM25 rankings are fused when
+    hybrid search is on; with reranking, RERANK_CANDIDATES are fetched and
+    the cross-encoder picks (and may drop) the final ones.
+    """
+    # Simplified - only filter by kb_identifier
+    filter_conditions = {
+        'kb_identifier': kb_identifier
+    }
+    depth = RERANK_CANDIDATES if RERANK_ENABLED else k
+    started = time.perf_counter()
+    if lexical_index is None:
+        candidates = await vectorstore.similarity_search(query, k=depth, filter_conditions=filter_conditions)
+    else:
+        vector_docs, lexical_docs = await asyncio.gather(
+            vectorstore.similarity_search(query, k=max(depth, SEARCH_CANDIDATES), filter_conditions=filter_conditions),
+            lexical_index.search(kb_identifier, query, max(depth, SEARCH_CANDIDATES)),
+        )
+        candidates = reciprocal_rank_fusion([vector_docs, lexical_docs], limit=depth, rrf_k=RRF_K)
+    retrieval_stage_seconds.observe(time.perf_counter() - started, "candidates")
+
+    docs = await rerank(query, candidates, k) if RERANK_ENABLED else candidates[:k]
+    search_result_chars.observe(sum(len(doc.page_content) for doc in candidates[:k]), "retrieved")
+    search_result_chars.observe(sum(len(doc.page_content) for doc in docs), "returned")
+    return docs
+
+_speculative_stats = {"started": 0, "used": 0, "rejected": 0}
+register_gauges("speculative_retrieval", lambda: dict(_speculative_stats))
+
+
+class SpeculativeRetrieval:
+    """
+    Retrieval started from the caller's transcript as soon as ASR returns,
+    while the LLM is still working out its search_docs call. search_docs
+    reuses the result when its query means the same as the transcript.
+    """
+
+    def __init__(self, transcript: str, kb_identifier: str):
+        self.transcript = transcript
+        self.kb_identifier = kb_identifier
+        self.task = asyncio.create_task(retrieve(transcript, kb_identifier))
+        _speculative_stats["started"] += 1
+
+    async def match(self, query: str, kb_identifier: str) -> Optional[list]:
+        """The prefetched chunks if query is close enough to the transcript, else None"""
+        if kb_identifier != self.kb_identifier:
+            return None
+        if QueryEmbeddingCache.normalize(query) != QueryEmbeddingCache.normalize(self.transcript):
+            # Full-size vectors are normalized, so the dot product is the cosine
+            query_vector, transcript_vector = await asyncio.gather(
+                embed_query(query), embed_query(self.transcript)
+            )
+            similarity = sum(a * b for a, b in zip(query_vector, transcript_vector))
+            if similarity < SPECULATIVE_MIN_SIMILARITY:
+                _speculative_stats["rejected"] += 1
+                return None
+        try:
+            docs = await self.task
+        except Exception as e:
+            logger.warning(f"⚠️ Speculative retrieval failed: {e}")
+            return None
+        _speculative_stats["used"] += 1
+        return docs
+
+    def cancel(self):
+        if self.task.done():
+            if not self.task.cancelled():
+                self.task.exception()  # Mark a failure as seen; it was never needed
+        else:
+            self.task.cancel()
+
 @tool
 async def search_docs(query: str, config: RunnableConfig) -> str:
     """Search the knowledge base for relevant context within a specific knowledge base."""
@@ -174,12 +299,10 @@ async def search_docs(query: str, config: RunnableConfig) -> str:
 
     kb_identifier = f"{userid}_{knowledge_base}"
 
-    # Simplified - only filter by kb_identifier
-    filter_conditions = {
-        'kb_identifier': kb_identifier
-    }
-
-    docs = await vectorstore.similarity_search(query, k=4, filter_conditions=filter_conditions)
+    speculative = config["configurable"].get("speculative_retrieval")
+    docs = await speculative.match(query, kb_identifier) if speculative else None
+    if docs is None:
+        docs = await retrieve(query, kb_identifier)
 
     for doc in docs:
         print(f"Found doc from KB: {doc.metadata.get('knowledge_base')}, Source: {doc.metadata.get('source')}")
@@ -0,0 +1,76 @@
+"""
+Cross-encoder reranking for search_docs.
+
+A small CPU cross-encoder scores (query, chunk) pairs for the over-fetched
+candidates; only chunks scoring at least RERANK_THRESHOLD are kept, best
+first, so irrelevant context stops inflating the prompt. Scoring runs on a
+dedicated thread under a hard time budget: if it does not finish in time,
+or the previous call is still running, the candidates are returned in
+their retrieval order instead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from sentence_transformers import CrossEncoder
+from typing import List
+import asyncio
+import logging
+import time
+import torch
+from metrics import retrieval_stage_seconds, register_gauges
+from config import RERANK_MODEL, RERANK_BACKEND, RERANK_THRESHOLD, RERANK_BUDGET_MS, RERANK_BATCH_SIZE
+
+logger = logging.getLogger("voicebot")
+
+# One thread: a call that overran its budget must not pile up more work
+rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+cross_encoder = CrossEncoder(RERANK_MODEL, device="cpu", backend=RERANK_BACKEND)
+
+_busy = False
+_stats = {"calls": 0, "fallbacks": 0, "dropped_chunks": 0}
+register_gauges("rerank", lambda: dict(_stats))
+
+
+def _score(query: str, texts: List[str]) -> List[float]:
+    global _busy
+    try:
+        # Many rerankers (ms-marco MiniLM included) default to raw logits; force relevance
+        # in [0, 1] so RERANK_THRESHOLD means the same thing whatever RERANK_MODEL is
+        return cross_encoder.predict(
+            [(query, text) for text in texts],
+            batch_size=RERANK_BATCH_SIZE,
+            activation_fn=torch.nn.Sigmoid(),
+            show_progress_bar=False,
+        ).tolist()
+    finally:
+        _busy = False
+
+
+async def rerank(query: str, docs: list, k: int, budget_ms: float = RERANK_BUDGET_MS) -> list:
+    """Best k of docs above the threshold, or the first k unchanged when over budget."""
+    global _busy
+    if not docs:
+        return docs
+    _stats["calls"] += 1
+    if _busy:
+        _stats["fallbacks"] += 1
+        logger.warning("⚠️ Reranker busy, keeping retrieval order")
+        return docs[:k]
+
+    started = time.perf_counter()
+    _busy = True
+    future = asyncio.get_running_loop().run_in_executor(
+        rerank_executor, _score, query, [doc.page_content for doc in docs]
+    )
+    try:
+        # shield: the thread can't be interrupted; let it finish in the background
+        scores = await asyncio.wait_for(asyncio.shield(future), budget_ms / 1000)
+    except asyncio.TimeoutError:
+        _stats["fallbacks"] += 1
+        logger.warning(f"⚠️ Rerank exceeded {budget_ms:.0f} ms budget, keeping retrieval order")
+        return docs[:k]
+    finally:
+        retrieval_stage_seconds.observe(time.perf_counter() - started, "rerank")
+
+    ranked = sorted(zip(scores, range(len(docs))), reverse=True)
+    kept = [docs[i] for score, i in ranked if score >= RERANK_THRESHOLD][:k]
+    _stats["dropped_chunks"] += min(k, len(docs)) - len(kept)
+    return kept
@@ -0,0 +1,245 @@
+"""
+Durable queue for end-of-session personalization notes.
+
+When a call ends the handler only records the session here (an sqlite row
+on this machine) and returns. A single background worker writes the notes
+with the LLM and stores them with upsert_session_summary, at most one LLM
+call every SESSION_SUMMARY_MIN_INTERVAL seconds, so a wave of hang-ups does
+not compete with live turns.
+
+Sessions the same user/persona ends within SESSION_SUMMARY_COALESCE_SECONDS
+of each other are merged into one row and summarized together. Failed
+attempts are retried with exponential backoff. On shutdown the worker
+drains what it can within SESSION_SUMMARY_DRAIN_SECONDS; anything left
+stays on disk and is picked up on the next start.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import BaseMessage, HumanMessage, messages_from_dict, messages_to_dict
+from typing import List, Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from config import (
+    SESSION_SUMMARY_QUEUE_PATH,
+    SESSION_SUMMARY_COALESCE_SECONDS,
+    SESSION_SUMMARY_MIN_INTERVAL,
+    SESSION_SUMMARY_MAX_ATTEMPTS,
+    SESSION_SUMMARY_RETRY_BASE,
+    SESSION_SUMMARY_DRAIN_SECONDS,
+)
+from custom_supabase import upsert_session_summary
+from greeting_service import schedule_greeting_prefetch
+from llm_service import get_llm
+from metrics import register_gauges
+
+logger = logging.getLogger("voicebot")
+
+SUMMARY_REQUEST = "This marks the end of the session, based on the entire conversation and user history so far, write a set of personalization notes which would serve as context in future sessions.Output format should be json."
+
+# One thread owns the database, so every read-modify-write is serialized
+summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+
+_stats = {"enqueued": 0, "coalesced": 0, "written": 0, "retried": 0, "dropped": 0}
+register_gauges("session_summary", lambda: dict(_stats))
+
+_db: Optional[sqlite3.Connection] = None
+_worker_task: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+_draining = False
+
+
+def _connect():
+    global _db
+    if _db is None:
+        directory = os.path.dirname(SESSION_SUMMARY_QUEUE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _db = sqlite3.connect(SESSION_SUMMARY_QUEUE_PATH, check_same_thread=False)
+        _db.execute(
+            """CREATE TABLE IF NOT EXISTS session_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                persona_id TEXT,
+                persona_source TEXT,
+                system_messages TEXT NOT NULL,
+                transcripts TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                due_at REAL NOT NULL
+            )"""
+        )
+        _db.commit()
+    return _db
+
+
+def _enqueue_sync(user_id, persona_id, persona_source, system_messages: str, transcript: str) -> bool:
+    db = _connect()
+    due_at = time.time() + SESSION_SUMMARY_COALESCE_SECONDS
+    row = db.execute(
+        "SELECT id, transcripts FROM session_summaries "
+        "WHERE user_id = ? AND persona_id IS ? AND persona_source IS ?",
+        (user_id, persona_id, persona_source),
+    ).fetchone()
+    if row is None:
+        db.execute(
+            "INSERT INTO session_summaries (user_id, persona_id, persona_source, system_messages, transcripts, due_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, persona_id, persona_source, system_messages, json.dumps([transcript]), due_at),
+        )
+    else:
+        # The newest system prompt carries the latest persona and notes
+        db.execute(
+            "UPDATE session_summaries SET system_messages = ?, transcripts = ?, version = version + 1, due_at = ? "
+            "WHERE id = ?",
+            (system_messages, json.dumps(json.loads(row[1]) + [transcript]), due_at, row[0]),
+        )
+    db.commit()
+    return row is not None
+
+
+def _next_job_sync(draining: bool):
+    """The next job to run, or (None, due time of the earliest waiting job)."""
+    db = _connect()
+    now = time.time()
+    # While draining, skip the coalescing wait but not the backoff of failed jobs
+    row = db.execute(
+        "SELECT id, user_id, persona_id, persona_source, system_messages, transcripts, version, attempts "
+        "FROM session_summaries WHERE due_at <= ? OR (? AND attempts = 0) ORDER BY due_at LIMIT 1",
+        (now, draining),
+    ).fetchone()
+    if row is None:
+        next_due = db.execute("SELECT MIN(due_at) FROM session_summaries").fetchone()[0]
+        return None, next_due
+    keys = ("id", "user_id", "persona_id", "persona_source", "system_messages", "transcripts", "version", "attempts")
+    job = dict(zip(keys, row))
+    job["transcripts"] = json.loads(job["transcripts"])
+    return job, None
+
+
+def _complete_sync(job: dict):
+    db = _connect()
+    row = db.execute("SELECT version, transcripts FROM session_summaries WHERE id = ?", (job["id"],)).fetchone()
+    if row is None:
+        return
+    if row[0] == job["version"]:
+        db.execute("DELETE FROM session_summaries WHERE id = ?", (job["id"],))
+    else:
+        # Sessions that ended while this one was being summarized get their own pass
+        remaining = json.loads(row[1])[len(job["transcripts"]):]
+        db.execute(
+            "UPDATE session_summaries SET transcripts = ?, attempts = 0 WHERE id = ?",
+            (json.dumps(remaining), job["id"]),
+        )
+    db.commit()
+
+
+def _fail_sync(job: dict) -> bool:
+    """Schedule a retry; returns False once the job has used up its attempts and is dropped."""
+    db = _connect()
+    attempts = job["attempts"] + 1
+    if attempts >= SESSION_SUMMARY_MAX_ATTEMPTS:
+        db.execute("DELETE FROM session_summaries WHERE id = ?", (job["id"],))
+        db.commit()
+        return False
+    db.execute(
+        "UPDATE session_summaries SET attempts = ?, due_at = ? WHERE id = ?",
+        (attempts, time.time() + SESSION_SUMMARY_RETRY_BASE * 2 ** job["attempts"], job["id"]),
+    )
+    db.commit()
+    return True
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(summary_executor, fn, *args)
+
+
+async def enqueue_session_summary(
+    user_id: str, persona_id: str, persona_source: str, system_messages: List[BaseMessage], transcript: str
+):
+    """Record an ended session; its notes are written in the background."""
+    coalesced = await _run(
+        _enqueue_sync, user_id, persona_id, persona_source,
+        json.dumps(messages_to_dict(system_messages)), transcript,
+    )
+    _stats["enqueued"] += 1
+    if coalesced:
+        _stats["coalesced"] += 1
+    if _wake is not None:
+        _wake.set()
+    logger.info(f"🗂️ Queued session summary for user {user_id}{' (merged)' if coalesced else ''}")
+
+
+async def _summarize(job: dict):
+    sessions = job["transcripts"]
+    if len(sessions) == 1:
+        conversation = sessions[0]
+    else:
+        conversation = "\n\n".join(f"Session {i}:\n{text}" for i, text in enumerate(sessions, start=1))
+    messages = messages_from_dict(json.loads(job["system_messages"]))
+    messages.append(HumanMessage(content=f"Conversation:\n{conversation}\n\n{SUMMARY_REQUEST}"))
+    response = await get_llm().ainvoke(messages)
+    await upsert_session_summary(job["user_id"], job["persona_id"], job["persona_source"], response.content)
+    # The summary is part of the greeting key, so warm that persona's next one now
+    # (not necessarily the active persona: the user may have switched since)
+    schedule_greeting_prefetch(job["user_id"], job["persona_id"], job["persona_source"])
+
+
+async def _worker():
+    last_call = 0.0
+    while True:
+        _wake.clear()
+        job, next_due = await _run(_next_job_sync, _draining)
+        if job is None:
+            if _draining:
+                return
+            timeout = None if next_due is None else max(next_due - time.time(), 0)
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        if not _draining:
+            wait = last_call + SESSION_SUMMARY_MIN_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        last_call = time.monotonic()
+        try:
+            await _summarize(job)
+        except Exception as e:
+            if await _run(_fail_sync, job):
+                _stats["retried"] += 1
+                logger.warning(f"⚠️ Session summary for user {job['user_id']} failed, will retry: {e}")
+            else:
+                _stats["dropped"] += 1
+                logger.error(f"❌ Dropping session summary for user {job['user_id']} after {SESSION_SUMMARY_MAX_ATTEMPTS} attempts: {e}")
+            continue
+        await _run(_complete_sync, job)
+        _stats["written"] += 1
+        logger.info(f"✅ Session summary stored for user {job['user_id']} ({len(job['transcripts'])} sessions)")
+
+
+def start_session_summary_worker():
+    global _worker_task, _wake, _draining
+    _wake = asyncio.Event()
+    _draining = False
+    _worker_task = asyncio.create_task(_worker())
+    logger.info(f"🧵 Started session summary worker ({SESSION_SUMMARY_QUEUE_PATH})")
+
+
+async def stop_session_summary_worker():
+    global _draining, _worker_task
+    if _worker_task is None:
+        return
+    _draining = True
+    _wake.set()
+    try:
+        await asyncio.wait_for(_worker_task, SESSION_SUMMARY_DRAIN_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Session summary drain timed out; remaining summaries stay queued on disk")
+    except Exception as e:
+        logger.exception(f"❌ Session summary worker failed: {e}")
+    _worker_task = None
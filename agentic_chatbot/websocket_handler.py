@@ -1,14 +1,168 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, AIMessageChunk
+import asyncio
 import logging
-from audio_services import groq_asr_bytes, murf_tts
-from llm_service import create_graph, create_basic_graph
-from clean import clean_markdown_for_tts
-from custom_supabase import get_user_runtime_variables, upsert_session_summary
-from map import LANGUAGE_CODE_TO_NAME
+import time
+from audio_services import groq_asr_bytes, murf_tts, murf_tts_stream
+from llm_service import create_graph, create_basic_graph, build_system_prompt, get_llm, BASIC_SYSTEM_PROMPT
+from greeting_service import (
+    ANONYMOUS_GREETING_KEY,
+    GREETING_REQUEST,
+    get_greeting,
+    persona_greeting_key,
+)
+from clean import clean_markdown_for_tts, SentenceSplitter
+from config import STREAMING_TURNS, TTS_MAX_PARALLEL_SENTENCES, SPECULATIVE_RETRIEVAL
+from rag_service import SpeculativeRetrieval
+from metrics import TurnTimer, ToolTimingHandler, prompt_tokens
+from conversation_context import ConversationContext
+from custom_supabase import get_user_runtime_variables
+from session_summary_queue import enqueue_session_summary
 
 logger = logging.getLogger("voicebot")
 
+# Graph nodes whose token stream is the spoken reply
+LLM_NODES = {"llm_with_tools", "llm_basic"}
+
+
+async def send_tts(
+    websocket: WebSocket, text: str, tts_kwargs, chunked: bool, timer: TurnTimer
+):
+    """Send one utterance framed by tts_start/tts_end, chunk by chunk if requested."""
+    await websocket.send_json({"type": "tts_start"})
+    started = time.perf_counter()
+    buffered = []
+    async for chunk in murf_tts_stream(text, **tts_kwargs):
+        timer.once("tts_first_byte", started)
+        if chunked:
+            sent_at = time.perf_counter()
+            await websocket.send_bytes(chunk)
+            timer.since("send", sent_at)
+        else:
+            buffered.append(chunk)
+    timer.since("tts_complete", started)
+    if buffered:
+        sent_at = time.perf_counter()
+        await websocket.send_bytes(b"".join(buffered))
+        timer.since("send", sent_at)
+    await websocket.send_json({"type": "tts_end"})
+
+
+async def stream_turn(
+    websocket: WebSocket, graph, messages, config, tts_kwargs, chunked: bool, timer: TurnTimer
+) -> str:
+    """
+    Run one turn in streaming mode.
+
+    Tokens are read from the graph as they are generated and cut into
+    sentences; each sentence is synthesized as soon as it is complete and sent
+    in order (tts_start, audio, tts_end) while later sentences are still being
+    generated. With chunked audio the current sentence's Murf chunks are
+    forwarded as they arrive. Returns the full LLM response text.
+    """
+    started = time.perf_counter()
+    first_audio_at = None
+    splitter = SentenceSplitter()
+    pending = asyncio.Queue()
+    semaphore = asyncio.Semaphore(TTS_MAX_PARALLEL_SENTENCES)
+    parts = []
+
+    async def synthesize(text, chunks: asyncio.Queue):
+        try:
+            async with semaphore:
+                synthesis_started = time.perf_counter()
+                async for chunk in murf_tts_stream(text, **tts_kwargs):
+                    timer.once("tts_first_byte", synthesis_started)
+                    chunks.put_nowait(chunk)
+                timer.since("tts_complete", synthesis_started)
+        finally:
+            chunks.put_nowait(None)
+
+    def schedule(sentence):
+        cleaned_at = time.perf_counter()
+        text = clean_markdown_for_tts(sentence)
+        timer.since("clean", cleaned_at)
+        if text:
+            chunks = asyncio.Queue()
+            task = asyncio.create_task(synthesize(text, chunks))
+            pending.put_nowait((sentence, chunks, task))
+
+    async def produce():
+        try:
+            async for chunk, metadata in graph.astream(
+                {"messages": messages}, config=config, stream_mode="messages"
+            ):
+                if metadata.get("langgraph_node") not in LLM_NODES:
+                    continue
+                if not isinstance(chunk, AIMessageChunk) or not isinstance(
+                    chunk.content, str
+                ):
+                    continue
+                if chunk.content:
+                    timer.once("llm_first_token", started)
+                parts.append(chunk.content)
+                for sentence in splitter.feed(chunk.content):
+                    schedule(sentence)
+            schedule(splitter.flush())
+            timer.since("llm_complete", started)
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    synthesis = None  # The sentence being sent; no longer in pending
+    try:
+        while (item := await pending.get()) is not None:
+            sentence, chunks, synthesis = item
+            await websocket.send_json({"type": "llm_partial", "text": sentence})
+            await websocket.send_json({"type": "tts_start"})
+            buffered = []
+            while (chunk := await chunks.get()) is not None:
+                if first_audio_at is None:
+                    first_audio_at = time.perf_counter()
+                    timer.since("first_audio", started)
+                    logger.info(
+                        f"⏱️ Time to first audio: {(first_audio_at - started) * 1000:.0f} ms"
+                    )
+                if chunked:
+                    sent_at = time.perf_counter()
+                    await websocket.send_bytes(chunk)
+                    timer.since("send", sent_at)
+                else:
+                    buffered.append(chunk)
+            await synthesis  # re-raise synthesis errors
+            if buffered:
+                sent_at = time.perf_counter()
+                await websocket.send_bytes(b"".join(buffered))
+                timer.since("send", sent_at)
+            await websocket.send_json({"type": "tts_end"})
+        await producer
+    finally:
+        producer.cancel()
+        if synthesis is not None:
+            if synthesis.done():
+                if not synthesis.cancelled():
+                    synthesis.exception()  # A send failed first; don't log this as unretrieved
+            else:
+                synthesis.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+    llm_response = "".join(parts)
+    await websocket.send_json(
+        {
+            "type": "llm_response",
+            "text": llm_response,
+            "time_to_first_audio_ms": (
+                round((first_audio_at - started) * 1000)
+                if first_audio_at is not None
+                else None
+            ),
+        }
+    )
+    return llm_response
+
 
 async def handle_websocket_connection(websocket: WebSocket):
     await websocket.accept()
@@ -20,6 +174,12 @@ async def handle_websocket_connection(websocket: WebSocket):
     messages = []
     rt_var = None
     flag = "user_id" in initial_data
+    streaming = initial_data.get("streaming", STREAMING_TURNS)
+    # Forward Murf chunks as separate binary frames between tts_start/tts_end
+    chunked_audio = initial_data.get("chunked_audio", streaming)
+    # Send per-turn stage timings to the client as a "timing" frame
+    send_timing = initial_data.get("timing", False)
+    tts_kwargs = {}
     if flag:
         thread_id = initial_data.get("user_id")
         rt_var = await get_user_runtime_variables(initial_data["user_id"])
@@ -30,43 +190,33 @@ async def handle_websocket_connection(websocket: WebSocket):
             mcp_config = None
         graph = await create_graph(kb_tool=rag_flag, mcp_config=mcp_config)
         lang_code = rt_var["language"]
-        lang = LANGUAGE_CODE_TO_NAME[lang_code]
+        tts_kwargs["voice_id"] = rt_var["accent"]
         config = {
             "configurable": {
                 "thread_id": thread_id,
                 "knowledge_base": rt_var["knowledge_base"],
             }
         }
-        if rt_var["session_summary"] != "":
-            prompt = f"Keep the responses short and concise. The responses should strictly be in {lang}.Dont use abbreviations or numerical content in your responses. previously the user has discussed: {rt_var['session_summary']}"
-        else:
-            prompt = f"Keep the responses short and concise. The responses should strictly be in {lang}.Dont use abbreviations or numerical content in your responses."
-        system_message = rt_var["system_prompt"] + prompt
+        system_message = build_system_prompt(rt_var)
         print(system_message)
         messages.append(SystemMessage(content=system_message))
+        greeting_key = persona_greeting_key(rt_var, system_message)
     else:
         graph = create_basic_graph()
         thread_id = str(uuid.uuid4())
         config = {"configurable": {"thread_id": thread_id}}
+        greeting_key = ANONYMOUS_GREETING_KEY
 
-    messages.append(
-        HumanMessage(
-            "Generate a greeting for the user, state who you are and how can you help the user"
-        )
-    )
+    # Served from the greeting cache when this persona setup has been seen before
+    greeting = await get_greeting(greeting_key, graph, messages, config, tts_kwargs)
+    # Recent turns within the token budget plus a rolling summary of the rest
+    context = ConversationContext(get_llm(), messages or [BASIC_SYSTEM_PROMPT])
+    context.add_turn(HumanMessage(GREETING_REQUEST), AIMessage(content=greeting.text))
     # Send connection successful after processing runtime variables
-    response = await graph.ainvoke({"messages": messages}, config=config)
-    response = response["messages"][-1].content
-    messages.append(AIMessage(content=response))
-    if flag:
-        audio = await murf_tts(
-            clean_markdown_for_tts(response), voice_id=rt_var["accent"]
-        )
-    else:
-        audio = await murf_tts(clean_markdown_for_tts(response))
     await websocket.send_json({"type": "connection_successful"})
-    await websocket.send_bytes(audio)
+    await websocket.send_bytes(greeting.audio)
 
+    speculative = None
     try:
         while True:
             try:
@@ -77,39 +227,77 @@ async def handle_websocket_connection(websocket: WebSocket):
                     break
 
                 lang = data.get("lang", "english").lower()
-                audio_bytes = await websocket.receive_bytes()
+                timer = TurnTimer()
+                turn_config = {**config, "callbacks": [ToolTimingHandler(timer)]}
+                with timer.span("receive"):
+                    audio_bytes = await websocket.receive_bytes()
 
                 # --- ASR ---
-                if flag:
-                    transcription = await groq_asr_bytes(
-                        audio_bytes, language=lang_code
+                with timer.span("asr"):
+                    if flag:
+                        transcription = await groq_asr_bytes(
+                            audio_bytes, language=lang_code
+                        )
+                    else:
+                        transcription = await groq_asr_bytes(audio_bytes)
+
+                speculative = None
+                if SPECULATIVE_RETRIEVAL and flag and rag_flag and transcription.strip():
+                    # Overlaps the knowledge base lookup with the LLM's first pass
+                    speculative = SpeculativeRetrieval(
+                        transcription, f"{thread_id}_{rt_var['knowledge_base']}"
                     )
-                else:
-                    transcription = await groq_asr_bytes(audio_bytes)
+                    turn_config["configurable"] = {
+                        **config["configurable"],
+                        "speculative_retrieval": speculative,
+                    }
 
                 await websocket.send_json(
                     {"type": "transcription", "text": transcription}
                 )
-                messages.append(HumanMessage(content=transcription))
+                human = HumanMessage(content=transcription)
+                messages = context.messages(human)
+                prompt_tokens.observe(context.token_estimate(human))
 
-                # --- LangGraph LLM (only pass new HumanMessage) ---
-                result = await graph.ainvoke({"messages": messages}, config=config)
-                llm_response = result["messages"][-1].content
-                await websocket.send_json(
-                    {"type": "llm_response", "text": llm_response}
-                )
-                llm_response = clean_markdown_for_tts(llm_response)
-                messages.append(AIMessage(content=llm_response))
-                # --- TTS ---
-                if flag:
-                    audio_stream = await murf_tts(
-                        llm_response, voice_id=rt_var["accent"]
+                if streaming:
+                    # --- LangGraph LLM + TTS, sentence by sentence ---
+                    llm_response = await stream_turn(
+                        websocket,
+                        graph,
+                        messages,
+                        turn_config,
+                        tts_kwargs,
+                        chunked_audio,
+                        timer,
+                    )
+                    context.add_turn(
+                        human, AIMessage(content=clean_markdown_for_tts(llm_response))
                     )
                 else:
-                    audio_stream = await murf_tts(llm_response)
-                await websocket.send_json({"type": "tts_start"})
-                await websocket.send_bytes(audio_stream)
-                await websocket.send_json({"type": "tts_end"})
+                    # --- LangGraph LLM (only pass new HumanMessage) ---
+                    with timer.span("llm_complete"):
+                        result = await graph.ainvoke(
+                            {"messages": messages}, config=turn_config
+                        )
+                    llm_response = result["messages"][-1].content
+                    await websocket.send_json(
+                        {"type": "llm_response", "text": llm_response}
+                    )
+                    with timer.span("clean"):
+                        llm_response = clean_markdown_for_tts(llm_response)
+                    context.add_turn(human, AIMessage(content=llm_response))
+                    # --- TTS ---
+                    await send_tts(
+                        websocket, llm_response, tts_kwargs, chunked_audio, timer
+                    )
+
+                if speculative is not None:
+                    speculative.cancel()  # Not needed once the turn is over
+                timer.finish()
+                if send_timing:
+                    await websocket.send_json(
+                        {"type": "timing", "spans_ms": timer.as_dict()}
+                    )
 
             except WebSocketDisconnect:
                 logger.info("🔌 WebSocket disconnected.")
@@ -121,26 +309,23 @@ async def handle_websocket_connection(websocket: WebSocket):
 
     finally:
         # This will only run when the WebSocket connection ends
+        if speculative is not None:
+            speculative.cancel()  # The turn failed or the client left mid-turn
+        context.close()
         if "user_id" in initial_data and rt_var is not None:
-            try:
-                # Generate session summary
-                summary_message = HumanMessage(
-                    content="This marks the end of the session, based on the entire conversation and user history so far, write a set of personalization notes which would serve as context in future sessions.Output format should be json."
-                )
-                messages.append(summary_message)
-                response = await graph.ainvoke({"messages": messages}, config=config)
-                summary = response["messages"][-1].content
-
-                # Store the session summary
-                resp = await upsert_session_summary(
-                    initial_data["user_id"],
-                    rt_var["active_persona_id"],
-                    rt_var["persona_source"],
-                    summary,
-                )
-                logger.info(f"✅ Session summary stored: {resp}")
-
-            except Exception as e:
-                logger.exception(f"❌ Error storing session summary: {e}")
+            if len(context.turns) > 1:
+                try:
+                    # Written by the background worker, not on the teardown path
+                    await enqueue_session_summary(
+                        initial_data["user_id"],
+                        rt_var["active_persona_id"],
+                        rt_var["persona_source"],
+                        context.system_messages,
+                        context.transcript(),
+                    )
+                except Exception as e:
+                    logger.exception(f"❌ Error queueing session summary: {e}")
+            else:
+                logger.info("🔄 Session ended before the first turn - no summary queued")
         else:
             logger.info("🔄 Anonymous session ended - no summary stored")
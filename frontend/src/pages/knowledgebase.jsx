@@ -349,6 +349,45 @@ const KnowledgeBaseDetail = ({ knowledgeBase, onBack }) => {
     fetchDocuments();
   }, [fetchDocuments]);
 
+  // Uploads are ingested in the background; poll the job until it finishes
+  const waitForIngestion = async (jobId, filename) => {
+    const endpoint = `${import.meta.env.VITE_BACKEND_URL}/upload_doc/${encodeURIComponent(jobId)}`;
+
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const response = await fetch(endpoint, {
+        headers: {
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+          "ngrok-skip-browser-warning": "true",
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error(
+          `Status check failed: ${response.status} ${response.statusText}`,
+        );
+      }
+
+      const job = await response.json();
+      if (job.status === "completed") return job;
+      if (job.status === "failed") {
+        throw new Error(job.error || "Processing failed");
+      }
+
+      const running = Object.entries(job.stages || {}).find(
+        ([, stage]) => stage.status === "running",
+      );
+      if (running) {
+        const [name, stage] = running;
+        setUploadStatus(
+          `Processing ${filename}: ${name} ${stage.done}${stage.total != null ? `/${stage.total}` : ""}`,
+        );
+      } else {
+        setUploadStatus(`Processing ${filename}: ${job.status}...`);
+      }
+    }
+  };
+
   // Updated uploadFileToServer function with proper API integration
   const uploadFileToServer = async (file) => {
     const formData = new FormData();
@@ -382,12 +421,18 @@ const KnowledgeBaseDetail = ({ knowledgeBase, onBack }) => {
       }
 
       const result = await response.json();
-      console.log("✅ Upload successful:", result);
+      if (result.error) {
+        throw new Error(result.error);
+      }
+      console.log("📥 Upload queued:", result);
+
+      const job = await waitForIngestion(result.job_id, file.name);
+      console.log("✅ Upload processed:", job);
 
       return {
         success: true,
-        data: result,
-        message: result.message || "File uploaded successfully",
+        data: job.result,
+        message: "File uploaded successfully",
       };
     } catch (error) {
       console.error("❌ Upload error:", error);